@@ -14,7 +14,7 @@ Requirements: 18.5
 """
 
 from fastapi import APIRouter
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 import json
@@ -64,6 +64,10 @@ class EvidenceItem(BaseModel):
     snippet: str
 
 
+# 证据列表整体交给 pydantic-core 校验，避免逐项构造模型
+_EVIDENCE_LIST_ADAPTER = TypeAdapter(List[EvidenceItem])
+
+
 class ChatResponse(BaseModel):
     """对话响应"""
     request_id: str
@@ -181,7 +185,7 @@ async def chat(request: ChatRequest) -> ChatResponse:
         steps = result.get("intermediate_steps", [])
         tool_results = _extract_tool_results(steps)
         evidence_items = (
-            [EvidenceItem(**item) for item in rag_data.get("evidence", [])]
+            _EVIDENCE_LIST_ADAPTER.validate_python(rag_data.get("evidence", []))
             if settings.AGENT_ENABLE_CITATIONS
             else []
         )
@@ -27,6 +27,7 @@ from app.schemas.rag import (
     NavigateRequest,
     NavigateResponse,
 )
+from app.core.rag.orchestrator import RAGOrchestrator
 from app.core.rag.service import RAGService, get_rag_service
 from app.core.rag.sync import DataSyncService, get_sync_service
 from app.core.rag.seed_data import (
@@ -164,7 +165,13 @@ async def trigger_sync(
         products = get_seed_products() if "products" in collections else []
         locations = get_seed_locations() if "locations" in collections else []
         
-        results = await sync_service.full_sync_all(stores, products, locations)
+        results = await sync_service.full_sync_all(
+            stores, products, locations, cache_embeddings=True
+        )
+        if stores:
+            get_rag_service().invalidate_store_index()
+        else:
+            RAGOrchestrator.clear_semantic_caches()
         
         items = [
             SyncResultItem(
@@ -174,7 +181,7 @@ async def trigger_sync(
                 updated=r.updated,
                 failed=r.failed,
                 duration_ms=r.duration_ms,
-                timestamp=r.timestamp.isoformat()
+                timestamp=r.timestamp_iso
             )
             for r in results
         ]
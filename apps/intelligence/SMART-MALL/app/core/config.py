@@ -61,6 +61,8 @@ class Settings(BaseSettings):
     # === Ollama Embedding 配置 ===
     OLLAMA_EMBEDDING_URL: str = "http://127.0.0.1:11434/api/embed"
     OLLAMA_EMBEDDING_MODEL: str = "bge-m3:latest"
+    OLLAMA_EMBEDDING_BATCH_SIZE: int = 64  # 按长度排序后的微批大小
+    OLLAMA_EMBEDDING_KEEP_ALIVE: str = "30m"  # 模型常驻 GPU/CPU 的时长，避免空闲后重新加载
     
     # LLM 参数
     LLM_TEMPERATURE: float = 0.3
@@ -77,18 +79,34 @@ class Settings(BaseSettings):
     MILVUS_COLLECTION_STORES: str = "stores"
     MILVUS_COLLECTION_PRODUCTS: str = "products"
     MILVUS_COLLECTION_LOCATIONS: str = "locations"
+    # 向量索引类型：HNSW（全精度）/ IVF_SQ8（标量量化，1 字节/维）
+    MILVUS_INDEX_TYPE: str = "HNSW"
+    # HNSW 索引参数
+    MILVUS_HNSW_M: int = 16  # 每个节点的最大连接数
+    MILVUS_HNSW_EF_CONSTRUCTION: int = 200  # 建索引时的候选集大小
+    MILVUS_HNSW_EF: int = 64  # 检索时的候选集大小（实际取 max(ef, top_k)）
+    # IVF_SQ8 索引参数
+    MILVUS_IVF_NLIST: int = 1024  # 聚类中心数量
+    MILVUS_IVF_NPROBE: int = 16  # 检索时探查的聚类数量
+    MILVUS_METRIC_TYPE: str = "COSINE"  # COSINE / IP；写入与查询向量均已 L2 归一化，IP 结果与 COSINE 一致且省去服务端归一化（仅对新建集合生效）
+    MILVUS_VECTOR_FLOAT16: bool = False  # 向量字段使用 FLOAT16_VECTOR（暂不支持：检索链路仍以 float32 查询，开启会被配置校验拒绝）
     
     # ============ Embedding 配置 ============
     EMBEDDING_PROVIDER: str = "qwen"  # qwen / openai / local
     EMBEDDING_MODEL: str = "text-embedding-v3"  # 通用 Embedding 模型配置
     # 通义千问 Embedding（推荐，中文效果好）
     QWEN_EMBEDDING_MODEL: str = "text-embedding-v3"
+    QWEN_EMBEDDING_BATCH_SIZE: int = 10  # 单次请求最大输入条数（text-embedding-v3 上限为 10）
+    QWEN_EMBEDDING_MAX_CONCURRENCY: int = 8  # 分片并发请求上限
     # OpenAI Embedding
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
     # 本地 Embedding（BGE-M3 / M3E）
     LOCAL_EMBEDDING_MODEL: str = "BAAI/bge-m3"
     # Embedding 维度（根据模型调整）
     EMBEDDING_DIMENSION: int = 1024  # BGE-M3: 1024, text-embedding-v3: 1024
+    EMBEDDING_EXECUTOR_WORKERS: int = 4  # Embedding 专用线程池大小
+    EMBEDDING_BATCH_WINDOW_MS: int = 5  # 并发单条 Embedding 请求的合并窗口（毫秒），0 表示不合并
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # 合并后单批最大条数
     # 文本分块配置
     CHUNK_SIZE: int = 512
     CHUNK_OVERLAP: int = 50
@@ -99,6 +117,19 @@ class Settings(BaseSettings):
     RAG_RERANK_ENABLED: bool = False  # 是否启用重排序
     RAG_CACHE_ENABLED: bool = True  # 是否启用缓存
     RAG_CACHE_TTL: int = 300  # 缓存过期时间（秒）
+    RAG_EMBEDDING_CACHE_MAX_SIZE: int = 10000  # 进程内 Embedding LRU 缓存条数上限
+    RAG_EMBEDDING_CACHE_REDIS_TTL: int = 86400  # Redis Embedding 缓存过期时间（秒）
+    RAG_EMBEDDING_CACHE_REDIS_COOLDOWN: float = 30.0  # Redis Embedding 缓存读写失败后跳过 Redis 的冷却时间（秒）
+    SYNC_CHUNK_SIZE: int = 1000  # 全量同步分块大小：逐块生成 Embedding 并写入，下一块的 Embedding 与本块写入重叠
+    SYNC_HISTORY_MAX: int = 1024  # 保留的同步结果条数上限，超出后丢弃最旧的记录
+    SEED_EMBEDDING_CACHE_DIR: str = ".cache/seed_embeddings"  # 示例数据 Embedding 的磁盘缓存目录，空字符串表示禁用
+    EMBEDDING_ACCURACY_CRITICAL: bool = False  # 为 True 时进程内缓存保留 float32，否则以 float16 存储
+    SEMANTIC_CACHE_ENABLED: bool = False  # 是否启用语义缓存（相似查询复用检索结果）
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # 语义缓存命中所需的最低余弦相似度
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1024  # 每类语义缓存的最大条目数
+    RAG_BREAKER_FAILURE_THRESHOLD: int = 5  # 单个集合连续检索失败多少次后熔断
+    RAG_BREAKER_RESET_TIMEOUT: float = 30.0  # 熔断冷却时间（秒），期间跳过该集合检索
+    RAG_STORE_INDEX_TTL: float = 300.0  # 店铺内存索引（名称精确匹配、分类/楼层过滤判空）的刷新周期（秒），0 表示禁用
     
     # ============ 数据同步配置 ============
     SYNC_BATCH_SIZE: int = 100  # 批量同步大小
@@ -150,6 +181,8 @@ class Settings(BaseSettings):
     # 缓存配置
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_MAX_CONNECTIONS: int = 20
+    REDIS_BINARY_CONNECT_TIMEOUT: float = 0.5  # bytes 客户端（向量缓存）建连超时（秒），Redis 不可用时快速失败
+    REDIS_BINARY_SOCKET_TIMEOUT: float = 0.5  # bytes 客户端（向量缓存）读写超时（秒）
     CACHE_TTL: int = 300  # 5 分钟
     
     # 配置元信息
@@ -221,6 +254,37 @@ class Settings(BaseSettings):
             raise ValueError(f"SPEECH_PROVIDER must be one of {valid_providers}, got {v}")
         return v.lower()
 
+    @field_validator("MILVUS_INDEX_TYPE")
+    @classmethod
+    def validate_milvus_index_type(cls, v: str) -> str:
+        """验证向量索引类型"""
+        valid_types = ["HNSW", "IVF_SQ8"]
+        upper = v.upper()
+        if upper not in valid_types:
+            raise ValueError(f"MILVUS_INDEX_TYPE must be one of {valid_types}, got {v}")
+        return upper
+
+    @field_validator("MILVUS_METRIC_TYPE")
+    @classmethod
+    def validate_milvus_metric_type(cls, v: str) -> str:
+        """验证向量距离度量"""
+        valid_metrics = ["COSINE", "IP"]
+        upper = v.upper()
+        if upper not in valid_metrics:
+            raise ValueError(f"MILVUS_METRIC_TYPE must be one of {valid_metrics}, got {v}")
+        return upper
+
+    @field_validator("MILVUS_VECTOR_FLOAT16")
+    @classmethod
+    def validate_milvus_vector_float16(cls, v: bool) -> bool:
+        """验证 FLOAT16 向量开关（检索链路尚不支持 float16 字段）"""
+        if v:
+            raise ValueError(
+                "MILVUS_VECTOR_FLOAT16 is not supported yet: RAG retrieval queries with float32 vectors, "
+                "which Milvus rejects against a FLOAT16_VECTOR field"
+            )
+        return v
+
     @field_validator("AGENT_RAG_MODE")
     @classmethod
     def validate_agent_rag_mode(cls, v: str) -> str:
@@ -2,19 +2,25 @@
 Embedding 提供商模块
 
 使用 LangChain Embeddings 接口，通过 Ollama 调用本地 bge-m3 模型，
-备用 Qwen Embedding（OpenAI 兼容接口），通过 with_fallbacks() 实现自动降级。
+备用 Qwen Embedding（OpenAI 兼容接口），通过 FallbackEmbeddings 实现自动降级，
+并报告实际生成向量的提供商（不同模型的向量不可混用，缓存需据此判断）。
 
 提供便捷工厂方法：
 - get_embeddings() - 带 fallback 的 Embedding 实例
 - get_current_provider_name() - 当前活跃提供商名称
+- aclose_http_clients() - 关闭共享 HTTP 连接池
 """
 
+import asyncio
 import json
 import logging
+import time
+import weakref
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import httpx
+import orjson
 from langchain_core.embeddings import Embeddings
 
 from app.core.config import settings
@@ -22,21 +28,122 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+# === 共享 HTTP 连接池 ===
+# 提供商实例会被 get_embeddings() 反复创建，连接池放在模块级，
+# 保证所有实例复用同一批 keep-alive 连接，避免每次请求重新握手。
+
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60.0,
+)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+_sync_client: Optional[httpx.Client] = None
+# 异步客户端的连接绑定在创建它的事件循环上，按运行中的事件循环分别缓存：
+# 测试或脚本中多次 asyncio.run() 时各自使用独立客户端，循环结束后随之释放
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_sync_client() -> httpx.Client:
+    """获取共享的同步 HTTP 客户端（懒加载）"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+    return _sync_client
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的异步 HTTP 客户端（懒加载）"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_http_clients() -> None:
+    """关闭共享 HTTP 客户端，释放连接（应用关闭时调用）
+
+    只能在所属事件循环中关闭异步客户端：关闭当前循环的客户端，
+    其他循环的客户端仅丢弃引用（其连接随所属循环一起释放）。
+    """
+    global _sync_client
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+    _async_clients.clear()
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+
+
+def _length_sorted_batches(texts: List[str], batch_size: int) -> Tuple[List[int], List[List[str]]]:
+    """
+    按文本长度排序后切分微批（smart batching）。
+
+    同一批内长度相近，模型按批内最长序列补齐时浪费的 pad token 更少。
+
+    Returns:
+        (排序后的原始下标, 微批列表)
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches = [
+        [texts[i] for i in order[start:start + batch_size]]
+        for start in range(0, len(order), batch_size)
+    ]
+    return order, batches
+
+
+def _restore_order(order: List[int], sorted_embeddings: List[List[float]]) -> List[List[float]]:
+    """将按长度排序得到的结果还原为输入顺序"""
+    restored: List[List[float]] = [None] * len(order)  # type: ignore[list-item]
+    for position, index in enumerate(order):
+        restored[index] = sorted_embeddings[position]
+    return restored
+
+
 class OllamaEmbeddingProvider(Embeddings):
     """基于 Ollama 的本地 Embedding 提供商（bge-m3）"""
 
+    def _post(self, texts: List[str]) -> List[List[float]]:
+        response = _get_sync_client().post(
+            settings.OLLAMA_EMBEDDING_URL,
+            json={
+                "model": settings.OLLAMA_EMBEDDING_MODEL,
+                "input": texts,
+                "keep_alive": settings.OLLAMA_EMBEDDING_KEEP_ALIVE,
+            },
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)["embeddings"]
+
+    async def _apost(self, texts: List[str]) -> List[List[float]]:
+        response = await _get_async_client().post(
+            settings.OLLAMA_EMBEDDING_URL,
+            json={
+                "model": settings.OLLAMA_EMBEDDING_MODEL,
+                "input": texts,
+                "keep_alive": settings.OLLAMA_EMBEDDING_KEEP_ALIVE,
+            },
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)["embeddings"]
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """同步批量 Embedding（LangChain 接口要求）"""
-        with httpx.Client(timeout=60.0) as client:
-            response = client.post(
-                settings.OLLAMA_EMBEDDING_URL,
-                json={
-                    "model": settings.OLLAMA_EMBEDDING_MODEL,
-                    "input": texts,
-                },
-            )
-            response.raise_for_status()
-            return response.json()["embeddings"]
+        """同步批量 Embedding（LangChain 接口要求），超过微批大小时按长度分批"""
+        batch_size = settings.OLLAMA_EMBEDDING_BATCH_SIZE
+        if len(texts) <= batch_size:
+            return self._post(texts)
+
+        order, batches = _length_sorted_batches(texts, batch_size)
+        sorted_embeddings: List[List[float]] = []
+        for batch in batches:
+            sorted_embeddings.extend(self._post(batch))
+        return _restore_order(order, sorted_embeddings)
 
     def embed_query(self, text: str) -> List[float]:
         """同步单条 Embedding"""
@@ -44,17 +151,16 @@ class OllamaEmbeddingProvider(Embeddings):
         return results[0]
 
     async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
-        """异步批量 Embedding"""
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                settings.OLLAMA_EMBEDDING_URL,
-                json={
-                    "model": settings.OLLAMA_EMBEDDING_MODEL,
-                    "input": texts,
-                },
-            )
-            response.raise_for_status()
-            return response.json()["embeddings"]
+        """异步批量 Embedding，超过微批大小时按长度分批"""
+        batch_size = settings.OLLAMA_EMBEDDING_BATCH_SIZE
+        if len(texts) <= batch_size:
+            return await self._apost(texts)
+
+        order, batches = _length_sorted_batches(texts, batch_size)
+        sorted_embeddings: List[List[float]] = []
+        for batch in batches:
+            sorted_embeddings.extend(await self._apost(batch))
+        return _restore_order(order, sorted_embeddings)
 
     async def aembed_query(self, text: str) -> List[float]:
         """异步单条 Embedding"""
@@ -63,60 +169,164 @@ class OllamaEmbeddingProvider(Embeddings):
 
 
 class QwenEmbeddingAdapter(Embeddings):
-    """Qwen Embedding 适配器（OpenAI 兼容接口）"""
-
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """同步批量 Embedding"""
-        with httpx.Client(timeout=60.0) as client:
-            response = client.post(
+    """
+    Qwen Embedding 适配器（OpenAI 兼容接口）
+
+    接口对单次请求的输入条数有上限（text-embedding-v3 为 10 条），
+    超出时按 QWEN_EMBEDDING_BATCH_SIZE 分片；异步路径并发发送分片，
+    并发数受 QWEN_EMBEDDING_MAX_CONCURRENCY 限制。429/5xx 按指数退避重试。
+    """
+
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+    MAX_RETRIES = 3
+    RETRY_BASE_DELAY = 0.5
+
+    @staticmethod
+    def _headers() -> dict:
+        return {
+            "Authorization": f"Bearer {settings.QWEN_API_KEY}",
+            "Content-Type": "application/json",
+        }
+
+    @staticmethod
+    def _shards(texts: List[str]) -> List[List[str]]:
+        size = settings.QWEN_EMBEDDING_BATCH_SIZE
+        return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+    def _post(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.MAX_RETRIES + 1):
+            response = _get_sync_client().post(
                 f"{settings.QWEN_BASE_URL}/embeddings",
-                headers={
-                    "Authorization": f"Bearer {settings.QWEN_API_KEY}",
-                    "Content-Type": "application/json",
-                },
+                headers=self._headers(),
                 json={
                     "model": settings.QWEN_EMBEDDING_MODEL,
                     "input": texts,
                 },
             )
+            if response.status_code in self.RETRYABLE_STATUS and attempt < self.MAX_RETRIES:
+                time.sleep(self.RETRY_BASE_DELAY * 2 ** attempt)
+                continue
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             return [item["embedding"] for item in data["data"]]
 
-    def embed_query(self, text: str) -> List[float]:
-        """同步单条 Embedding"""
-        results = self.embed_documents([text])
-        return results[0]
-
-    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
-        """异步批量 Embedding"""
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
+    async def _apost(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.MAX_RETRIES + 1):
+            response = await _get_async_client().post(
                 f"{settings.QWEN_BASE_URL}/embeddings",
-                headers={
-                    "Authorization": f"Bearer {settings.QWEN_API_KEY}",
-                    "Content-Type": "application/json",
-                },
+                headers=self._headers(),
                 json={
                     "model": settings.QWEN_EMBEDDING_MODEL,
                     "input": texts,
                 },
             )
+            if response.status_code in self.RETRYABLE_STATUS and attempt < self.MAX_RETRIES:
+                await asyncio.sleep(self.RETRY_BASE_DELAY * 2 ** attempt)
+                continue
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             return [item["embedding"] for item in data["data"]]
 
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """同步批量 Embedding（超过单次上限时顺序分片）"""
+        embeddings: List[List[float]] = []
+        for shard in self._shards(texts):
+            embeddings.extend(self._post(shard))
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        """同步单条 Embedding"""
+        results = self.embed_documents([text])
+        return results[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步批量 Embedding（超过单次上限时并发分片）"""
+        shards = self._shards(texts)
+        if len(shards) <= 1:
+            return await self._apost(texts)
+
+        semaphore = asyncio.Semaphore(settings.QWEN_EMBEDDING_MAX_CONCURRENCY)
+
+        async def _bounded(shard: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._apost(shard)
+
+        results = await asyncio.gather(*(_bounded(shard) for shard in shards))
+        return [embedding for shard_result in results for embedding in shard_result]
+
     async def aembed_query(self, text: str) -> List[float]:
         """异步单条 Embedding"""
         results = await self.aembed_documents([text])
         return results[0]
 
 
+class FallbackEmbeddings(Embeddings):
+    """
+    按顺序尝试多个 Embedding 提供商，前一个失败时回退到下一个
+
+    *_with_provider 方法额外返回实际生成向量的提供商名称：主备模型的向量空间不同，
+    调用方据此避免把回退向量写入以主模型为准的缓存。
+    """
+
+    def __init__(self, providers: List[Tuple[str, Embeddings]]):
+        """
+        Args:
+            providers: (提供商名称, Embeddings 实例) 列表，第一个为主提供商
+        """
+        self.providers = providers
+
+    @property
+    def primary_name(self) -> str:
+        """主提供商名称"""
+        return self.providers[0][0]
+
+    def _log_fallback(self, name: str, error: Exception) -> None:
+        logger.warning(json.dumps({
+            "event": "embedding_provider_failed",
+            "provider": name,
+            "reason": str(error),
+        }, ensure_ascii=False))
+
+    def embed_documents_with_provider(self, texts: List[str]) -> Tuple[List[List[float]], str]:
+        """同步批量 Embedding，返回 (向量列表, 提供商名称)"""
+        last_error: Optional[Exception] = None
+        for name, provider in self.providers:
+            try:
+                return provider.embed_documents(texts), name
+            except Exception as e:
+                self._log_fallback(name, e)
+                last_error = e
+        raise last_error
+
+    async def aembed_documents_with_provider(self, texts: List[str]) -> Tuple[List[List[float]], str]:
+        """异步批量 Embedding，返回 (向量列表, 提供商名称)"""
+        last_error: Optional[Exception] = None
+        for name, provider in self.providers:
+            try:
+                return await provider.aembed_documents(texts), name
+            except Exception as e:
+                self._log_fallback(name, e)
+                last_error = e
+        raise last_error
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_with_provider(texts)[0]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return (await self.aembed_documents_with_provider(texts))[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
 class EmbeddingProvider:
     """Embedding 提供商，带自动回退（Ollama → Qwen）"""
 
     @classmethod
-    def get_embeddings(cls) -> Embeddings:
+    def get_embeddings(cls) -> FallbackEmbeddings:
         """
         获取带回退能力的 Embedding 实例。
 
@@ -135,10 +345,10 @@ class EmbeddingProvider:
             "fallback": f"qwen/{settings.QWEN_EMBEDDING_MODEL}",
         }, ensure_ascii=False))
 
-        return primary.with_fallbacks(
-            [fallback],
-            exceptions_to_handle=(Exception,),
-        )
+        return FallbackEmbeddings([
+            (f"ollama/{settings.OLLAMA_EMBEDDING_MODEL}", primary),
+            (f"qwen/{settings.QWEN_EMBEDDING_MODEL}", fallback),
+        ])
 
     @classmethod
     def get_current_provider_name(cls) -> str:
@@ -148,16 +358,16 @@ class EmbeddingProvider:
         通过 Ollama 健康检查判断：可用返回 "ollama"，否则返回 "qwen_fallback"。
         """
         try:
-            with httpx.Client(timeout=5.0) as client:
-                response = client.post(
-                    settings.OLLAMA_EMBEDDING_URL,
-                    json={
-                        "model": settings.OLLAMA_EMBEDDING_MODEL,
-                        "input": ["health_check"],
-                    },
-                )
-                response.raise_for_status()
-                return "ollama"
+            response = _get_sync_client().post(
+                settings.OLLAMA_EMBEDDING_URL,
+                json={
+                    "model": settings.OLLAMA_EMBEDDING_MODEL,
+                    "input": ["health_check"],
+                },
+                timeout=5.0,
+            )
+            response.raise_for_status()
+            return "ollama"
         except Exception as e:
             logger.warning(json.dumps({
                 "event": "embedding_degradation",
@@ -170,7 +380,7 @@ class EmbeddingProvider:
 
 # === 模块级便捷工厂方法 ===
 
-def get_embeddings() -> Embeddings:
+def get_embeddings() -> FallbackEmbeddings:
     """获取带回退能力的 Embedding 实例"""
     return EmbeddingProvider.get_embeddings()
 
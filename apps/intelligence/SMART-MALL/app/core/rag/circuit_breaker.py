@@ -0,0 +1,52 @@
+"""
+检索熔断器
+
+Milvus 部分不可用时，每次检索都要等到 RPC 超时才失败，拖高整条聊天链路的尾延迟。
+熔断器在连续失败达到阈值后打开，冷却期内直接跳过检索；
+冷却期结束后放行试探请求，成功即恢复。
+"""
+
+import time
+from typing import Optional
+
+
+class CircuitBreaker:
+    """
+    连续失败计数熔断器
+
+    - 关闭：正常放行，成功时清零失败计数
+    - 打开：连续失败 failure_threshold 次后进入，reset_timeout 秒内 allow() 返回 False
+    - 半开：冷却期结束后放行请求，成功则关闭，失败则重新打开
+    - 只在单个事件循环线程中使用，不加锁
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        Args:
+            failure_threshold: 触发熔断的连续失败次数
+            reset_timeout: 熔断冷却时间（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return (
+            self._opened_at is not None
+            and time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        return not self.is_open
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
@@ -7,23 +7,100 @@ Embedding 服务（旧版兼容层）
 内部已改为委托给 LangChain Embedding 提供商。
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import logging
-import hashlib
 import asyncio
+import threading
+import time
 from functools import lru_cache
+import re
+
+import numpy as np
+import xxhash
 
 from app.core.config import settings
+from app.core.redis_pool import RedisPoolFactory
 
 logger = logging.getLogger(__name__)
 
+# Redis 二级缓存键前缀
+EMBEDDING_CACHE_KEY_PREFIX = b"smartmall:embedding:"
+
+# 文本分块使用的句子分隔符
+_SENTENCE_SEP_RE = re.compile(r"[。！？.!?\n]")
+
 
 class EmbeddingError(Exception):
     """Embedding 生成错误"""
     pass
 
 
+class _EmbedBatcher:
+    """
+    合并并发的单条 Embedding 请求
+
+    首个请求到达后等待 max_wait 秒（或攒满 max_batch 条），
+    把这段时间内的请求合成一次批量调用，再把结果分发给各个等待者。
+    """
+
+    def __init__(self, embed_many, max_batch: int, max_wait: float):
+        """
+        Args:
+            embed_many: 批量 Embedding 协程函数，List[str] -> (List[List[float]], 提供商名称)
+            max_batch: 单批最大条数
+            max_wait: 攒批等待时间（秒）
+        """
+        self._embed_many = embed_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # 持有批次任务的强引用：事件循环只保留弱引用，未被引用的任务可能在执行中被回收
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> Tuple[List[float], str]:
+        """返回 (向量, 实际生成向量的提供商名称)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        """立即提交尚在攒批的请求，并等待所有进行中的批次完成"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            embeddings, provider = await self._embed_many([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result((embedding, provider))
+
+
 class EmbeddingService:
     """
     Embedding 服务（旧版兼容层）
@@ -36,7 +113,36 @@ class EmbeddingService:
         self.provider_name = provider or settings.EMBEDDING_PROVIDER
         self._langchain_embeddings = None
         self.cache_enabled = settings.RAG_CACHE_ENABLED
-        self._cache: Dict[str, List[float]] = {}
+        # 一级缓存：进程内有界 LRU；二级缓存：Redis（float16 bytes）
+        # 向量以 numpy 数组紧凑存储：默认 float16（2 字节/维），
+        # EMBEDDING_ACCURACY_CRITICAL=True 时保留 float32
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_dtype = np.float32 if settings.EMBEDDING_ACCURACY_CRITICAL else np.float16
+        self.cache_max_size = settings.RAG_EMBEDDING_CACHE_MAX_SIZE
+        self.redis_ttl = settings.RAG_EMBEDDING_CACHE_REDIS_TTL
+        # Redis 读写失败后在冷却期内跳过 Redis，避免每次未命中都等待超时
+        self.redis_cooldown = settings.RAG_EMBEDDING_CACHE_REDIS_COOLDOWN
+        self._redis_retry_at = 0.0
+        # 后台 Redis 写入任务（持有引用防止被回收，关闭时等待完成）
+        self._redis_tasks: Set[asyncio.Task] = set()
+        # 缓存只保存主提供商（Ollama）生成的向量，键以主模型与维度为种子：
+        # 更换模型或维度后旧向量自然失效；回退提供商的向量不写入缓存（见 _is_primary）
+        self._cache_key_seed = xxhash.xxh3_64_intdigest(
+            f"ollama/{settings.OLLAMA_EMBEDDING_MODEL}|{settings.EMBEDDING_DIMENSION}".encode("utf-8")
+        )
+        # 专用线程池：Embedding 调用不与默认线程池中的其他阻塞任务争抢线程
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.EMBEDDING_EXECUTOR_WORKERS,
+            thread_name_prefix="embedding",
+        )
+        # 并发的 embed_text 请求在短时间窗口内合并为一次批量调用
+        self._batcher: Optional[_EmbedBatcher] = None
+        if settings.EMBEDDING_BATCH_WINDOW_MS > 0:
+            self._batcher = _EmbedBatcher(
+                self._embed_uncached,
+                max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait=settings.EMBEDDING_BATCH_WINDOW_MS / 1000,
+            )
         self.chunk_size = settings.CHUNK_SIZE
         self.chunk_overlap = settings.CHUNK_OVERLAP
 
@@ -53,64 +159,198 @@ class EmbeddingService:
         """Embedding 维度"""
         return settings.EMBEDDING_DIMENSION
 
-    def _get_cache_key(self, text: str) -> str:
-        """生成缓存键"""
-        return hashlib.md5(text.encode()).hexdigest()
+    def _get_cache_key(self, text: str) -> bytes:
+        """生成缓存键（以模型配置为种子的 xxh3_128 原始摘要，16 字节）"""
+        return xxhash.xxh3_128_digest(text.encode("utf-8"), seed=self._cache_key_seed)
+
+    def _cache_get(self, cache_key: bytes) -> Optional[List[float]]:
+        """读取进程内 LRU 缓存，命中时刷新为最近使用"""
+        embedding = self._cache.get(cache_key)
+        if embedding is None:
+            return None
+        self._cache.move_to_end(cache_key)
+        return embedding.astype(np.float32).tolist()
+
+    def _cache_put(self, cache_key: bytes, embedding: List[float]) -> None:
+        """写入进程内 LRU 缓存，超出上限时淘汰最久未使用的条目"""
+        self._cache[cache_key] = np.asarray(embedding, dtype=self._cache_dtype)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_max_size:
+            self._cache.popitem(last=False)
+
+    def _redis_available(self) -> bool:
+        """Redis 是否处于可用状态（不在失败后的冷却期内）"""
+        return time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, op: str, error: Exception) -> None:
+        """记录 Redis 读写失败并进入冷却期"""
+        if self._redis_available():
+            logger.warning(
+                "Embedding redis cache %s failed, skipping redis for %.0fs: %s",
+                op, self.redis_cooldown, error,
+            )
+        self._redis_retry_at = time.monotonic() + self.redis_cooldown
+
+    async def _redis_get_many(self, cache_keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """批量读取 Redis 二级缓存，Redis 不可用或处于冷却期时返回空结果"""
+        if not self._redis_available():
+            return {}
+        try:
+            client = await RedisPoolFactory.get_binary_client()
+            rows = await client.mget([EMBEDDING_CACHE_KEY_PREFIX + k for k in cache_keys])
+        except Exception as e:
+            self._redis_failed("read", e)
+            return {}
+
+        found: Dict[bytes, List[float]] = {}
+        for cache_key, raw in zip(cache_keys, rows):
+            if raw:
+                found[cache_key] = np.frombuffer(raw, dtype=np.float16).astype(np.float32).tolist()
+        return found
+
+    async def _redis_put_many(self, items: Dict[bytes, List[float]]) -> None:
+        """批量写入 Redis 二级缓存（float16 bytes），失败时进入冷却期"""
+        if not items or not self._redis_available():
+            return
+        try:
+            client = await RedisPoolFactory.get_binary_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for cache_key, embedding in items.items():
+                    pipe.set(
+                        EMBEDDING_CACHE_KEY_PREFIX + cache_key,
+                        np.asarray(embedding, dtype=np.float16).tobytes(),
+                        ex=self.redis_ttl,
+                    )
+                await pipe.execute()
+        except Exception as e:
+            self._redis_failed("write", e)
+
+    def _schedule_redis_put(self, items: Dict[bytes, List[float]]) -> None:
+        """后台写入 Redis 二级缓存，不阻塞当前请求"""
+        if not items or not self._redis_available():
+            return
+        task = asyncio.create_task(self._redis_put_many(items))
+        self._redis_tasks.add(task)
+        task.add_done_callback(self._redis_tasks.discard)
+
+    @property
+    def primary_provider(self) -> str:
+        """主提供商名称（如 ollama/bge-m3）"""
+        return self._embeddings.primary_name
+
+    def _is_primary(self, provider: str) -> bool:
+        """向量是否由主提供商生成（只有主提供商的向量可以写入缓存）"""
+        return provider == self.primary_provider
+
+    async def _embed_uncached(self, texts: List[str]) -> Tuple[List[List[float]], str]:
+        """
+        直接调用提供商批量生成 Embedding（不经过缓存），重复文本只计算一次
+
+        Returns:
+            (向量列表, 实际生成向量的提供商名称)
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        embeddings, provider = await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: self._embeddings.embed_documents_with_provider(unique_texts)
+        )
+        if len(unique_texts) == len(texts):
+            return embeddings, provider
+        by_text = dict(zip(unique_texts, embeddings))
+        return [by_text[text] for text in texts], provider
 
     async def embed_text(self, text: str, use_cache: bool = True) -> List[float]:
-        """生成文本 Embedding"""
+        """生成文本 Embedding（进程内 LRU → Redis → 提供商）"""
         if not text or not text.strip():
             raise EmbeddingError("Empty text")
 
         if use_cache and self.cache_enabled:
             cache_key = self._get_cache_key(text)
-            if cache_key in self._cache:
-                return self._cache[cache_key]
-
-        embedding = await asyncio.get_event_loop().run_in_executor(
-            None, lambda: self._embeddings.embed_query(text)
-        )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+            cached = (await self._redis_get_many([cache_key])).get(cache_key)
+            if cached is not None:
+                self._cache_put(cache_key, cached)
+                return cached
+
+        if self._batcher is not None:
+            embedding, provider = await self._batcher.embed(text)
+        else:
+            embeddings, provider = await self._embed_uncached([text])
+            embedding = embeddings[0]
 
-        if use_cache and self.cache_enabled:
-            self._cache[cache_key] = embedding
+        # 回退提供商的向量与主模型不在同一向量空间，不缓存，避免主提供商恢复后仍被复用
+        if use_cache and self.cache_enabled and self._is_primary(provider):
+            self._cache_put(cache_key, embedding)
+            self._schedule_redis_put({cache_key: embedding})
 
         return embedding
 
     async def embed_batch(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
         """批量生成 Embedding"""
+        return (await self.embed_batch_with_provider(texts, use_cache))[0]
+
+    async def embed_batch_with_provider(
+        self, texts: List[str], use_cache: bool = True
+    ) -> Tuple[List[List[float]], str]:
+        """
+        批量生成 Embedding，并返回生成向量的提供商名称
+
+        缓存中只有主提供商的向量，全部命中时返回主提供商；
+        有回退提供商参与时返回回退提供商名称，调用方据此决定是否持久化结果。
+        """
+        provider = self.primary_provider
         if not texts:
-            return []
+            return [], provider
 
         valid_texts = [t for t in texts if t and t.strip()]
         if not valid_texts:
             raise EmbeddingError("All texts are empty")
 
+        # 相同文本只查一次缓存、只向提供商请求一次，最后按原顺序回填
+        unique_texts = list(dict.fromkeys(valid_texts))
         results: Dict[int, List[float]] = {}
         texts_to_embed: List[tuple] = []
-
-        if use_cache and self.cache_enabled:
-            for i, text in enumerate(valid_texts):
-                cache_key = self._get_cache_key(text)
-                if cache_key in self._cache:
-                    results[i] = self._cache[cache_key]
+        use_cache = use_cache and self.cache_enabled
+
+        if use_cache:
+            cache_keys = [self._get_cache_key(text) for text in unique_texts]
+            misses: List[int] = []
+            for i, cache_key in enumerate(cache_keys):
+                cached = self._cache_get(cache_key)
+                if cached is not None:
+                    results[i] = cached
                 else:
-                    texts_to_embed.append((i, text))
+                    misses.append(i)
+
+            if misses:
+                from_redis = await self._redis_get_many([cache_keys[i] for i in misses])
+                for i in misses:
+                    cached = from_redis.get(cache_keys[i])
+                    if cached is not None:
+                        results[i] = cached
+                        self._cache_put(cache_keys[i], cached)
+                    else:
+                        texts_to_embed.append((i, unique_texts[i]))
         else:
-            texts_to_embed = list(enumerate(valid_texts))
+            texts_to_embed = list(enumerate(unique_texts))
 
         if texts_to_embed:
-            indices, texts_list = zip(*texts_to_embed)
-            embeddings = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: self._embeddings.embed_documents(list(texts_list))
-            )
+            embeddings, provider = await self._embed_uncached([text for _, text in texts_to_embed])
+            cacheable = use_cache and self._is_primary(provider)
 
-            for idx, embedding in zip(indices, embeddings):
+            to_redis: Dict[bytes, List[float]] = {}
+            for (idx, _), embedding in zip(texts_to_embed, embeddings):
                 results[idx] = embedding
-                if use_cache and self.cache_enabled:
-                    cache_key = self._get_cache_key(valid_texts[idx])
-                    self._cache[cache_key] = embedding
+                if cacheable:
+                    self._cache_put(cache_keys[idx], embedding)
+                    to_redis[cache_keys[idx]] = embedding
+            self._schedule_redis_put(to_redis)
 
-        return [results[i] for i in range(len(valid_texts))]
+        if len(unique_texts) == len(valid_texts):
+            return [results[i] for i in range(len(valid_texts))], provider
+        position = {text: i for i, text in enumerate(unique_texts)}
+        return [results[position[text]] for text in valid_texts], provider
 
     def chunk_text(self, text: str) -> List[str]:
         """将长文本分块"""
@@ -123,22 +363,28 @@ class EmbeddingService:
 
         chunks = []
         start = 0
+        text_len = len(text)
 
-        while start < len(text):
+        while start < text_len:
             end = start + self.chunk_size
 
-            if end < len(text):
-                for sep in ["。", "！", "？", ".", "!", "?", "\n"]:
-                    last_sep = text.rfind(sep, start, end)
-                    if last_sep > start:
-                        end = last_sep + 1
-                        break
+            if end < text_len:
+                # 单次正则扫描窗口，取最后一个句子分隔符作为切分点
+                last_sep = None
+                for last_sep in _SENTENCE_SEP_RE.finditer(text, start + 1, end):
+                    pass
+                if last_sep is not None:
+                    end = last_sep.end()
 
             chunk = text[start:end].strip()
             if chunk:
                 chunks.append(chunk)
 
-            start = end - self.chunk_overlap if end < len(text) else end
+            if end >= text_len:
+                break
+            # 重叠回退后必须前进，否则分隔符靠近窗口起点时会死循环
+            next_start = end - self.chunk_overlap
+            start = next_start if next_start > start else end
 
         return chunks
 
@@ -149,18 +395,30 @@ class EmbeddingService:
         if len(chunks) == 1:
             return await self.embed_text(chunks[0])
 
-        embeddings = await self.embed_batch(chunks)
+        embeddings = await self._embed_batch_np(chunks)
 
-        import numpy as np
-        avg_embedding = np.mean(embeddings, axis=0)
+        # 在连续 float32 缓冲区上原地求均值并归一化
+        avg_embedding = embeddings.mean(axis=0)
         norm = np.linalg.norm(avg_embedding)
         if norm > 0:
-            avg_embedding = avg_embedding / norm
+            avg_embedding *= 1.0 / norm
 
         return avg_embedding.tolist()
 
+    async def _embed_batch_np(self, texts: List[str]) -> np.ndarray:
+        """批量生成 Embedding，返回 (N, D) 的 float32 矩阵"""
+        embeddings = await self.embed_batch(texts)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    async def aclose(self) -> None:
+        """关闭服务：等待进行中的批量 Embedding 与后台 Redis 写入完成（应用关闭时调用）"""
+        if self._batcher is not None:
+            await self._batcher.aclose()
+        if self._redis_tasks:
+            await asyncio.gather(*self._redis_tasks, return_exceptions=True)
+
     def clear_cache(self) -> None:
-        """清空缓存"""
+        """清空进程内缓存（Redis 缓存按 TTL 自然过期）"""
         self._cache.clear()
 
     def cache_size(self) -> int:
@@ -169,11 +427,20 @@ class EmbeddingService:
 
 
 _embedding_service: Optional[EmbeddingService] = None
+_embedding_service_lock = threading.Lock()
 
 
 def get_embedding_service() -> EmbeddingService:
-    """获取 Embedding 服务单例"""
+    """获取 Embedding 服务单例（双重检查加锁，避免并发创建多个实例及其线程池）"""
     global _embedding_service
     if _embedding_service is None:
-        _embedding_service = EmbeddingService()
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
     return _embedding_service
+
+
+async def aclose_embedding_service() -> None:
+    """关闭 Embedding 服务单例（未创建时不做任何事）"""
+    if _embedding_service is not None:
+        await _embedding_service.aclose()
@@ -4,7 +4,7 @@ Milvus 向量数据库客户端
 提供与 Milvus 的连接管理、集合操作、数据操作等功能
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
 from pymilvus import (
     connections,
     Collection,
@@ -13,13 +13,71 @@ from pymilvus import (
     DataType,
     utility,
 )
+import asyncio
+import json
 import logging
+import threading
 import time
 
+import numpy as np
+
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 向量字段名（所有集合统一）
+VECTOR_FIELD = "embedding"
+# 写入与检索时向量的 numpy 类型，需与 Schema 中的向量字段类型一致
+VECTOR_NP_DTYPE = np.float16 if settings.MILVUS_VECTOR_FLOAT16 else np.float32
+_VECTOR_DTYPES = (DataType.FLOAT_VECTOR, DataType.FLOAT16_VECTOR)
+
+
+def default_index_params() -> Dict[str, Any]:
+    """
+    默认向量索引参数（由 MILVUS_INDEX_TYPE 决定）
+    
+    - HNSW：float32 全精度图索引，召回率高，内存占用 4 字节/维
+    - IVF_SQ8：标量量化到 1 字节/维，检索内存带宽约降为 1/4，
+      召回率略有下降（通常 1-3%），适合内存受限、可容忍少量召回损失的场景
+    """
+    if settings.MILVUS_INDEX_TYPE == "IVF_SQ8":
+        return {
+            "metric_type": settings.MILVUS_METRIC_TYPE,
+            "index_type": "IVF_SQ8",
+            "params": {"nlist": settings.MILVUS_IVF_NLIST},
+        }
+    return {
+        "metric_type": settings.MILVUS_METRIC_TYPE,
+        "index_type": "HNSW",
+        "params": {
+            "M": settings.MILVUS_HNSW_M,
+            "efConstruction": settings.MILVUS_HNSW_EF_CONSTRUCTION,
+        },
+    }
+
+
+def default_search_params(top_k: int) -> Dict[str, Any]:
+    """默认检索参数（与 default_index_params 的索引类型对应，HNSW 要求 ef >= top_k）"""
+    if settings.MILVUS_INDEX_TYPE == "IVF_SQ8":
+        return {
+            "metric_type": settings.MILVUS_METRIC_TYPE,
+            "params": {"nprobe": settings.MILVUS_IVF_NPROBE},
+        }
+    return {
+        "metric_type": settings.MILVUS_METRIC_TYPE,
+        "params": {"ef": max(settings.MILVUS_HNSW_EF, top_k)},
+    }
+
+
+def build_id_in_expr(ids: List[str]) -> str:
+    """
+    构建 `id in [...]` 删除表达式
+    
+    每个 ID 经 json.dumps 转义为双引号字符串字面量，
+    避免 ID 中的引号或反斜杠破坏表达式（表达式注入）。
+    """
+    return "id in [" + ",".join(json.dumps(str(i), ensure_ascii=False) for i in ids) + "]"
+
 
 class MilvusConnectionError(Exception):
     """Milvus 连接错误"""
@@ -34,6 +92,9 @@ class MilvusOperationError(Exception):
 class SearchResult:
     """检索结果"""
     
+    # 每次检索会创建 top_k 个实例，使用 __slots__ 省去每实例的 __dict__
+    __slots__ = ("id", "score", "data")
+    
     def __init__(
         self,
         id: str,
@@ -55,10 +116,17 @@ class MilvusClient:
     提供：
     - 连接管理（connect/disconnect）
     - 集合操作（create/drop/list）
-    - 数据操作（insert/delete/search）
+    - 数据操作（insert/delete/search/search_batch）
     - 健康检查
     """
     
+    # has_collection 结果缓存时长（秒）
+    EXISTS_CACHE_TTL = 30.0
+    # 单次 delete 表达式包含的最大 ID 数量
+    DELETE_BATCH_SIZE = 1024
+    # 单次 insert RPC 的最大行数（1024 维 float32 约 20MB，低于 gRPC 默认消息上限）
+    INSERT_BATCH_SIZE = 5000
+    
     def __init__(
         self,
         host: str = None,
@@ -87,6 +155,12 @@ class MilvusClient:
         self.alias = alias
         self._connected = False
         self._collections: Dict[str, Collection] = {}
+        # 已 load 到内存的集合，避免重复 load RPC
+        self._loaded: Set[str] = set()
+        # has_collection 结果缓存：name -> (是否存在, 检查时间)
+        self._exists_cache: Dict[str, Tuple[bool, float]] = {}
+        # 默认输出字段（全部标量字段）：name -> 字段列表
+        self._output_fields: Dict[str, List[str]] = {}
     
     def connect(self) -> bool:
         """
@@ -96,7 +170,7 @@ class MilvusClient:
             是否连接成功
         """
         try:
-            logger.info(f"Connecting to Milvus at {self.host}:{self.port}...")
+            logger.info("Connecting to Milvus at %s:%s...", self.host, self.port)
             
             connect_params = {
                 "alias": self.alias,
@@ -112,11 +186,11 @@ class MilvusClient:
             connections.connect(**connect_params)
             self._connected = True
             
-            logger.info(f"Connected to Milvus successfully")
+            logger.info("Connected to Milvus successfully")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to connect to Milvus: {e}")
+            logger.error("Failed to connect to Milvus: %s", e)
             self._connected = False
             raise MilvusConnectionError(f"Failed to connect to Milvus: {e}")
     
@@ -127,9 +201,12 @@ class MilvusClient:
                 connections.disconnect(self.alias)
                 self._connected = False
                 self._collections.clear()
+                self._output_fields.clear()
+                self._loaded.clear()
+                self._exists_cache.clear()
                 logger.info("Disconnected from Milvus")
         except Exception as e:
-            logger.warning(f"Error disconnecting from Milvus: {e}")
+            logger.warning("Error disconnecting from Milvus: %s", e)
     
     def is_connected(self) -> bool:
         """检查是否已连接"""
@@ -181,6 +258,9 @@ class MilvusClient:
         """
         创建集合
         
+        未指定 index_params 时使用 default_index_params()：默认 HNSW，
+        设置 MILVUS_INDEX_TYPE=IVF_SQ8 可用 1 字节/维的量化索引换取内存与带宽。
+        
         Args:
             name: 集合名称
             schema: 集合 Schema
@@ -191,10 +271,10 @@ class MilvusClient:
         """
         try:
             if utility.has_collection(name, using=self.alias):
-                logger.info(f"Collection '{name}' already exists, loading...")
+                logger.info("Collection '%s' already exists, loading...", name)
                 collection = Collection(name=name, using=self.alias)
             else:
-                logger.info(f"Creating collection '{name}'...")
+                logger.info("Creating collection '%s'...", name)
                 collection = Collection(
                     name=name,
                     schema=schema,
@@ -203,31 +283,28 @@ class MilvusClient:
                 
                 # 创建向量索引
                 if index_params is None:
-                    index_params = {
-                        "metric_type": "COSINE",
-                        "index_type": "IVF_FLAT",
-                        "params": {"nlist": 128}
-                    }
+                    index_params = default_index_params()
                 
                 # 找到向量字段并创建索引
                 for field in schema.fields:
-                    if field.dtype == DataType.FLOAT_VECTOR:
+                    if field.dtype in _VECTOR_DTYPES:
                         collection.create_index(
                             field_name=field.name,
                             index_params=index_params
                         )
-                        logger.info(f"Created index on field '{field.name}'")
+                        logger.info("Created index on field '%s'", field.name)
                         break
             
             # 加载集合到内存
-            collection.load()
+            self._ensure_loaded(name, collection)
             self._collections[name] = collection
+            self._exists_cache[name] = (True, time.monotonic())
             
-            logger.info(f"Collection '{name}' ready")
+            logger.info("Collection '%s' ready", name)
             return collection
             
         except Exception as e:
-            logger.error(f"Failed to create collection '{name}': {e}")
+            logger.error("Failed to create collection '%s': %s", name, e)
             raise MilvusOperationError(f"Failed to create collection: {e}")
     
     def drop_collection(self, name: str) -> bool:
@@ -243,12 +320,12 @@ class MilvusClient:
         try:
             if utility.has_collection(name, using=self.alias):
                 utility.drop_collection(name, using=self.alias)
-                self._collections.pop(name, None)
-                logger.info(f"Dropped collection '{name}'")
+                self._forget_collection(name)
+                logger.info("Dropped collection '%s'", name)
                 return True
             return False
         except Exception as e:
-            logger.error(f"Failed to drop collection '{name}': {e}")
+            logger.error("Failed to drop collection '%s': %s", name, e)
             raise MilvusOperationError(f"Failed to drop collection: {e}")
     
     def list_collections(self) -> List[str]:
@@ -256,67 +333,195 @@ class MilvusClient:
         return utility.list_collections(using=self.alias)
     
     def has_collection(self, name: str) -> bool:
-        """检查集合是否存在"""
-        return utility.has_collection(name, using=self.alias)
+        """
+        检查集合是否存在
+        
+        已缓存的集合直接返回 True；其余结果缓存 EXISTS_CACHE_TTL 秒，
+        合并连续写入时的重复 RPC。
+        """
+        if name in self._collections:
+            return True
+        
+        now = time.monotonic()
+        cached = self._exists_cache.get(name)
+        if cached is not None and now - cached[1] < self.EXISTS_CACHE_TTL:
+            return cached[0]
+        
+        exists = utility.has_collection(name, using=self.alias)
+        self._exists_cache[name] = (exists, now)
+        return exists
     
     def get_collection(self, name: str) -> Optional[Collection]:
-        """获取集合对象"""
-        if name in self._collections:
-            return self._collections[name]
+        """获取集合对象（命中缓存时不发起任何 RPC）"""
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
         
-        if utility.has_collection(name, using=self.alias):
+        if self.has_collection(name):
             collection = Collection(name=name, using=self.alias)
-            collection.load()
+            self._ensure_loaded(name, collection)
             self._collections[name] = collection
             return collection
         
         return None
     
+    def refresh_collection(self, name: str) -> Optional[Collection]:
+        """丢弃集合缓存并重新获取（Schema 变更或外部重建集合后调用）"""
+        self._forget_collection(name)
+        return self.get_collection(name)
+    
+    def _ensure_loaded(self, name: str, collection: Collection) -> None:
+        """集合未 load 时才调用 load()"""
+        if name not in self._loaded:
+            collection.load()
+            self._loaded.add(name)
+    
+    def _forget_collection(self, name: str) -> None:
+        """清除集合相关的全部缓存"""
+        self._collections.pop(name, None)
+        self._loaded.discard(name)
+        self._exists_cache.pop(name, None)
+        self._output_fields.pop(name, None)
+    
+    def _default_output_fields(self, name: str, collection: Collection) -> List[str]:
+        """集合的全部标量字段（按集合缓存，Schema 不变时无需重复遍历）"""
+        fields = self._output_fields.get(name)
+        if fields is None:
+            fields = [
+                field.name for field in collection.schema.fields
+                if field.dtype not in _VECTOR_DTYPES
+            ]
+            self._output_fields[name] = fields
+        return fields
+    
     # ============ 数据操作 ============
     
     def insert(
         self,
         collection_name: str,
-        data: List[Dict[str, Any]]
+        data: List[Dict[str, Any]],
+        flush: bool = False
     ) -> List[str]:
         """
-        插入数据
+        插入数据（行格式）
         
         Args:
             collection_name: 集合名称
             data: 数据列表，每个元素是一个字典
+            flush: 是否在插入后立即 flush（默认否，批量写入后调用 flush_collection）
+            
+        Returns:
+            插入的 ID 列表
+        """
+        if not data:
+            return []
+        
+        # 行转列（一次性转置）
+        columns = {field: [item[field] for item in data] for field in data[0]}
+        return self.insert_columns(collection_name, columns, flush=flush)
+    
+    def insert_columns(
+        self,
+        collection_name: str,
+        columns: Dict[str, Any],
+        flush: bool = False
+    ) -> List[str]:
+        """
+        插入数据（列格式）
+        
+        向量列会被转换为连续的 float32 矩阵（MILVUS_VECTOR_FLOAT16 时为 float16），
+        pymilvus 可直接按缓冲区序列化，避免逐个 float 装箱。
+        
+        Args:
+            collection_name: 集合名称
+            columns: 字段名 -> 列数据（list 或 np.ndarray），字段顺序需与 Schema 一致
+            flush: 是否在插入后立即 flush
             
         Returns:
             插入的 ID 列表
         """
+        try:
+            primary_keys = self._write_columns(collection_name, columns, flush, upsert=False)
+            logger.info("Inserted %s records into '%s'", len(primary_keys), collection_name)
+            return primary_keys
+        except Exception as e:
+            logger.error("Failed to insert data: %s", e)
+            raise MilvusOperationError(f"Failed to insert data: {e}")
+    
+    def upsert_columns(
+        self,
+        collection_name: str,
+        columns: Dict[str, Any],
+        flush: bool = False
+    ) -> List[str]:
+        """
+        按主键覆盖写入（列格式）
+        
+        使用 Milvus 原生 upsert：单次 RPC 完成替换，不存在先删后插之间
+        记录短暂缺失的窗口。列格式要求同 insert_columns。
+        
+        Returns:
+            写入的 ID 列表
+        """
+        try:
+            primary_keys = self._write_columns(collection_name, columns, flush, upsert=True)
+            logger.info("Upserted %s records into '%s'", len(primary_keys), collection_name)
+            return primary_keys
+        except Exception as e:
+            logger.error("Failed to upsert data: %s", e)
+            raise MilvusOperationError(f"Failed to upsert data: {e}")
+    
+    def _write_columns(
+        self,
+        collection_name: str,
+        columns: Dict[str, Any],
+        flush: bool,
+        upsert: bool
+    ) -> List[str]:
+        """insert_columns / upsert_columns 的公共实现"""
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            raise MilvusOperationError(f"Collection '{collection_name}' not found")
+        
+        if not columns:
+            return []
+        
+        data = []
+        for field, values in columns.items():
+            if field == VECTOR_FIELD:
+                values = np.ascontiguousarray(values, dtype=VECTOR_NP_DTYPE)
+            data.append(values)
+        
+        write = collection.upsert if upsert else collection.insert
+        
+        # 整列一次提交；超过单次上限时按行切片（ndarray 切片为视图，不复制）
+        total = len(data[0])
+        primary_keys: List[str] = []
+        for start in range(0, total, self.INSERT_BATCH_SIZE):
+            end = start + self.INSERT_BATCH_SIZE
+            result = write([values[start:end] for values in data])
+            primary_keys.extend(str(pk) for pk in result.primary_keys)
+        
+        if flush:
+            collection.flush()
+        return primary_keys
+    
+    def flush_collection(self, collection_name: str) -> None:
+        """
+        刷新集合，封存增长中的段
+        
+        插入默认不 flush；批量写入完成后（如每 1 万行或全量同步结束）调用一次即可。
+        """
         try:
             collection = self.get_collection(collection_name)
             if collection is None:
                 raise MilvusOperationError(f"Collection '{collection_name}' not found")
-            
-            # 转换数据格式
-            if not data:
-                return []
-            
-            # 获取字段名
-            fields = list(data[0].keys())
-            insert_data = []
-            
-            for field in fields:
-                field_data = [item[field] for item in data]
-                insert_data.append(field_data)
-            
-            result = collection.insert(insert_data)
-            
-            # 刷新数据
             collection.flush()
-            
-            logger.info(f"Inserted {len(data)} records into '{collection_name}'")
-            return [str(pk) for pk in result.primary_keys]
-            
+        except MilvusOperationError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to insert data: {e}")
-            raise MilvusOperationError(f"Failed to insert data: {e}")
+            logger.error("Failed to flush collection '%s': %s", collection_name, e)
+            raise MilvusOperationError(f"Failed to flush collection: {e}")
     
     def delete(
         self,
@@ -338,14 +543,18 @@ class MilvusClient:
             if collection is None:
                 raise MilvusOperationError(f"Collection '{collection_name}' not found")
             
-            expr = f"id in {ids}"
-            result = collection.delete(expr)
+            # 分块删除，保持表达式短小，降低 Milvus 表达式解析开销
+            deleted = 0
+            for start in range(0, len(ids), self.DELETE_BATCH_SIZE):
+                chunk = ids[start:start + self.DELETE_BATCH_SIZE]
+                result = collection.delete(build_id_in_expr(chunk))
+                deleted += result.delete_count
             
-            logger.info(f"Deleted {result.delete_count} records from '{collection_name}'")
-            return result.delete_count
+            logger.info("Deleted %s records from '%s'", deleted, collection_name)
+            return deleted
             
         except Exception as e:
-            logger.error(f"Failed to delete data: {e}")
+            logger.error("Failed to delete data: %s", e)
             raise MilvusOperationError(f"Failed to delete data: {e}")
     
     def search(
@@ -369,6 +578,34 @@ class MilvusClient:
         Returns:
             检索结果列表
         """
+        return self.search_batch(
+            collection_name, [query_vector], top_k, filters, output_fields
+        )[0]
+    
+    def search_batch(
+        self,
+        collection_name: str,
+        query_vectors: Union[List[List[float]], np.ndarray],
+        top_k: int = 5,
+        filters: Optional[str] = None,
+        output_fields: Optional[List[str]] = None
+    ) -> List[List[SearchResult]]:
+        """
+        批量向量检索（多个查询向量一次 RPC）
+        
+        Args:
+            collection_name: 集合名称
+            query_vectors: 查询向量列表或 (N, D) 矩阵
+            top_k: 每个查询的返回数量
+            filters: 过滤表达式（Milvus 表达式语法），对所有查询生效
+            output_fields: 输出字段列表
+            
+        Returns:
+            与 query_vectors 一一对应的检索结果列表
+        """
+        if len(query_vectors) == 0:
+            return []
+        
         try:
             collection = self.get_collection(collection_name)
             if collection is None:
@@ -376,27 +613,22 @@ class MilvusClient:
             
             # 默认输出所有标量字段
             if output_fields is None:
-                output_fields = [
-                    field.name for field in collection.schema.fields
-                    if field.dtype != DataType.FLOAT_VECTOR
-                ]
+                output_fields = self._default_output_fields(collection_name, collection)
             
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
-            }
+            search_params = default_search_params(top_k)
             
             results = collection.search(
-                data=[query_vector],
-                anns_field="embedding",
+                data=np.ascontiguousarray(query_vectors, dtype=VECTOR_NP_DTYPE),
+                anns_field=VECTOR_FIELD,
                 param=search_params,
                 limit=top_k,
                 expr=filters,
                 output_fields=output_fields
             )
             
-            search_results = []
+            batch_results = []
             for hits in results:
+                search_results = []
                 for hit in hits:
                     data = {field: getattr(hit.entity, field) for field in output_fields}
                     search_results.append(SearchResult(
@@ -404,13 +636,47 @@ class MilvusClient:
                         score=hit.score,
                         data=data
                     ))
+                batch_results.append(search_results)
             
-            return search_results
+            return batch_results
             
         except Exception as e:
-            logger.error(f"Failed to search: {e}")
+            logger.error("Failed to search: %s", e)
             raise MilvusOperationError(f"Failed to search: {e}")
     
+    def query(
+        self,
+        collection_name: str,
+        expr: str,
+        output_fields: Optional[List[str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按标量表达式查询（不做向量检索）
+        
+        Args:
+            collection_name: 集合名称
+            expr: 过滤表达式（Milvus 表达式语法）
+            output_fields: 输出字段列表，默认输出所有标量字段
+            limit: 最大返回条数
+            
+        Returns:
+            字段名 -> 值 的字典列表
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is None:
+                raise MilvusOperationError(f"Collection '{collection_name}' not found")
+            
+            if output_fields is None:
+                output_fields = self._default_output_fields(collection_name, collection)
+            
+            return collection.query(expr=expr, output_fields=output_fields, limit=limit)
+            
+        except Exception as e:
+            logger.error("Failed to query: %s", e)
+            raise MilvusOperationError(f"Failed to query: {e}")
+    
     def count(self, collection_name: str) -> int:
         """获取集合中的记录数量"""
         collection = self.get_collection(collection_name)
@@ -418,6 +684,84 @@ class MilvusClient:
             return 0
         return collection.num_entities
     
+    # ============ 异步封装 ============
+    # pymilvus ORM 接口均为阻塞 RPC，在事件循环中直接调用会卡住所有协程；
+    # 以下方法将其放到线程中执行，供异步代码使用。
+    
+    async def has_collection_async(self, name: str) -> bool:
+        return await asyncio.to_thread(self.has_collection, name)
+    
+    async def create_collection_async(
+        self,
+        name: str,
+        schema: CollectionSchema,
+        index_params: Optional[Dict] = None
+    ) -> Collection:
+        return await asyncio.to_thread(self.create_collection, name, schema, index_params)
+    
+    async def insert_async(
+        self,
+        collection_name: str,
+        data: List[Dict[str, Any]],
+        flush: bool = False
+    ) -> List[str]:
+        return await asyncio.to_thread(self.insert, collection_name, data, flush)
+    
+    async def insert_columns_async(
+        self,
+        collection_name: str,
+        columns: Dict[str, Any],
+        flush: bool = False
+    ) -> List[str]:
+        return await asyncio.to_thread(self.insert_columns, collection_name, columns, flush)
+    
+    async def upsert_columns_async(
+        self,
+        collection_name: str,
+        columns: Dict[str, Any],
+        flush: bool = False
+    ) -> List[str]:
+        return await asyncio.to_thread(self.upsert_columns, collection_name, columns, flush)
+    
+    async def flush_collection_async(self, collection_name: str) -> None:
+        await asyncio.to_thread(self.flush_collection, collection_name)
+    
+    async def delete_async(self, collection_name: str, ids: List[str]) -> int:
+        return await asyncio.to_thread(self.delete, collection_name, ids)
+    
+    async def search_async(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        top_k: int = 5,
+        filters: Optional[str] = None,
+        output_fields: Optional[List[str]] = None
+    ) -> List[SearchResult]:
+        return await asyncio.to_thread(
+            self.search, collection_name, query_vector, top_k, filters, output_fields
+        )
+    
+    async def search_batch_async(
+        self,
+        collection_name: str,
+        query_vectors: Union[List[List[float]], np.ndarray],
+        top_k: int = 5,
+        filters: Optional[str] = None,
+        output_fields: Optional[List[str]] = None
+    ) -> List[List[SearchResult]]:
+        return await asyncio.to_thread(
+            self.search_batch, collection_name, query_vectors, top_k, filters, output_fields
+        )
+    
+    async def query_async(
+        self,
+        collection_name: str,
+        expr: str,
+        output_fields: Optional[List[str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.query, collection_name, expr, output_fields, limit)
+    
     # ============ 上下文管理 ============
     
     def __enter__(self):
@@ -430,11 +774,14 @@ class MilvusClient:
 
 # 全局客户端实例（懒加载）
 _milvus_client: Optional[MilvusClient] = None
+_milvus_client_lock = threading.Lock()
 
 
 def get_milvus_client() -> MilvusClient:
-    """获取 Milvus 客户端单例"""
+    """获取 Milvus 客户端单例（同步写入在工作线程中调用，创建时加锁，避免并发建出多个实例）"""
     global _milvus_client
     if _milvus_client is None:
-        _milvus_client = MilvusClient()
+        with _milvus_client_lock:
+            if _milvus_client is None:
+                _milvus_client = MilvusClient()
     return _milvus_client
@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
+import copy
+import heapq
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.core.config import get_settings
+from app.core.rag.semantic_cache import SemanticCache
 
 
 @dataclass
@@ -60,12 +63,34 @@ class RAGOrchestrator:
         "哪个",
     )
 
+    # 按检索策略划分的语义缓存：strategy -> SemanticCache
+    _semantic_caches: Dict[str, SemanticCache] = {}
+
     @classmethod
     def _get_rag_service(cls):
         from app.core.rag.service import get_rag_service
 
         return get_rag_service()
 
+    @classmethod
+    def _get_semantic_cache(cls, strategy: str) -> SemanticCache:
+        cache = cls._semantic_caches.get(strategy)
+        if cache is None:
+            settings = get_settings()
+            cache = SemanticCache(
+                max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                ttl=settings.RAG_CACHE_TTL,
+            )
+            cls._semantic_caches[strategy] = cache
+        return cache
+
+    @classmethod
+    def clear_semantic_caches(cls) -> None:
+        """清空各策略的语义缓存（索引数据同步或店铺索引失效后调用）"""
+        for cache in cls._semantic_caches.values():
+            cache.clear()
+
     @classmethod
     async def augment(
         cls,
@@ -83,32 +108,45 @@ class RAGOrchestrator:
             return cls._empty("none")
 
         rag = cls._get_rag_service()
+        # 与检索共用同一查询向量（空白归一化 + L2 归一化），缓存查找与检索只嵌入一次
+        query_vector = await rag._embed_query(query)
+        use_cache = settings.SEMANTIC_CACHE_ENABLED and query_vector is not None
+        if use_cache:
+            cached = cls._get_semantic_cache(strategy).get(query_vector)
+            if cached is not None:
+                # 深拷贝返回，调用方修改 evidence 不会污染缓存条目
+                return copy.deepcopy(cached)
+
         if strategy == "navigation":
-            docs = await rag.search_for_navigation(query)
+            docs = await rag.search_for_navigation(query, query_vector=query_vector)
         elif strategy == "evaluation":
-            docs = await rag.search_for_evaluation(query)
+            docs = await rag.search_for_evaluation(query, query_vector=query_vector)
         else:
-            docs = await rag.search_for_complex(query)
+            docs = await rag.search_for_complex(query, query_vector=query_vector)
 
         evidences = cls._collect_evidence(query, docs)
         evidences = [e for e in evidences if e.score >= settings.AGENT_RAG_MIN_SCORE]
         if not evidences:
             return cls._empty(strategy)
 
+        top_k = max(1, settings.AGENT_RAG_TOP_K)
         if settings.RAG_RERANK_ENABLED:
-            evidences = cls._rerank(query, evidences)
-
-        evidences = evidences[: max(1, settings.AGENT_RAG_TOP_K)]
+            evidences = cls._rerank(query, evidences, limit=top_k)
+        else:
+            evidences = evidences[:top_k]
         rag_context = cls._build_context_text(
             evidences,
             max_chars=settings.AGENT_RAG_MAX_CONTEXT_CHARS,
         )
-        return {
+        result = {
             "rag_used": True,
             "retrieval_strategy": strategy,
             "evidence": [e.to_dict() for e in evidences],
             "rag_context": rag_context,
         }
+        if use_cache:
+            cls._get_semantic_cache(strategy).put(query_vector, copy.deepcopy(result))
+        return result
 
     @classmethod
     def _empty(cls, strategy: str) -> Dict[str, Any]:
@@ -140,23 +178,26 @@ class RAGOrchestrator:
 
     @classmethod
     def _collect_evidence(cls, query: str, docs: List[Any]) -> List[EvidenceItem]:
-        evidences: List[EvidenceItem] = []
+        """转换为证据项；同一集合中重复命中的文档只保留得分最高的一条"""
+        best: Dict[Tuple[str, str], EvidenceItem] = {}
         for idx, doc in enumerate(docs):
             meta = getattr(doc, "metadata", {}) or {}
             content = str(meta.get("content") or getattr(doc, "page_content", "") or "")
             snippet = content.strip()[:120]
             if not snippet:
                 continue
-            evidences.append(
-                EvidenceItem(
-                    id=str(meta.get("id", f"doc_{idx}")),
-                    source_type=str(meta.get("source_type", "unknown")),
-                    source_collection=str(meta.get("source_collection", "unknown")),
-                    score=cls._resolve_score(meta, query, snippet),
-                    snippet=snippet,
-                )
+            item = EvidenceItem(
+                id=str(meta.get("id", f"doc_{idx}")),
+                source_type=str(meta.get("source_type", "unknown")),
+                source_collection=str(meta.get("source_collection", "unknown")),
+                score=cls._resolve_score(meta, query, snippet),
+                snippet=snippet,
             )
-        return evidences
+            key = (item.source_collection, item.id)
+            existing = best.get(key)
+            if existing is None or item.score > existing.score:
+                best[key] = item
+        return list(best.values())
 
     @classmethod
     def _resolve_score(cls, meta: Dict[str, Any], query: str, snippet: str) -> float:
@@ -171,7 +212,9 @@ class RAGOrchestrator:
         return min(1.0, 0.4 + 0.15 * hits)
 
     @classmethod
-    def _rerank(cls, query: str, evidences: List[EvidenceItem]) -> List[EvidenceItem]:
+    def _rerank(
+        cls, query: str, evidences: List[EvidenceItem], limit: Optional[int] = None
+    ) -> List[EvidenceItem]:
         lowered = query.lower()
         scored = []
         for e in evidences:
@@ -181,6 +224,8 @@ class RAGOrchestrator:
             if any(token in e.snippet.lower() for token in lowered.split() if token):
                 bonus += 0.05
             scored.append((e.score + bonus, e))
+        if limit is not None:
+            return [e for _, e in heapq.nlargest(limit, scored, key=lambda x: x[0])]
         scored.sort(key=lambda x: x[0], reverse=True)
         return [e for _, e in scored]
 
@@ -6,13 +6,17 @@ LangChain Retriever 实现
 - build_filter_expr: Milvus 过滤表达式构建器
 """
 
-from typing import List, Optional, Dict, Any
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Tuple
+import json
 import logging
 
 from langchain_core.retrievers import BaseRetriever
 
 from app.core.config import settings
 from app.core.embedding_provider import get_embeddings
+from app.core.rag.milvus_client import default_index_params, default_search_params
 
 try:
     from langchain_milvus import Milvus
@@ -42,8 +46,41 @@ class RAGRetrieverFactory:
     - similarity 搜索
     - metadata 过滤（分类、楼层、价格区间、品牌）
     - 统一使用 get_embeddings() 获取 Embedding 实例
+
+    Milvus 向量存储按集合缓存复用（构造时会建立连接并加载集合），
+    每次创建 Retriever 只是以不同的 search_kwargs 包装同一个存储。
     """
 
+    # collection_name -> Milvus 向量存储
+    _vector_stores: Dict[str, Any] = {}
+    # (collection_name, 过滤表达式, top_k) -> Retriever，按 LRU 淘汰
+    _filtered_retrievers: "OrderedDict[Tuple[str, Optional[str], Optional[int]], BaseRetriever]" = OrderedDict()
+    FILTERED_RETRIEVER_CACHE_SIZE = 256
+
+    @classmethod
+    def get_vector_store(cls, collection_name: str):
+        """获取指定集合的 Milvus 向量存储（首次调用时创建）"""
+        vector_store = cls._vector_stores.get(collection_name)
+        if vector_store is None:
+            vector_store = Milvus(
+                embedding_function=get_embeddings(),
+                collection_name=collection_name,
+                connection_args={
+                    "host": settings.MILVUS_HOST,
+                    "port": settings.MILVUS_PORT,
+                },
+                index_params=default_index_params(),
+                search_params=default_search_params(settings.RAG_TOP_K),
+            )
+            cls._vector_stores[collection_name] = vector_store
+        return vector_store
+
+    @classmethod
+    def clear(cls) -> None:
+        """丢弃缓存的向量存储与 Retriever（如集合重建后）"""
+        cls._vector_stores.clear()
+        cls._filtered_retrievers.clear()
+
     @classmethod
     def create_retriever(
         cls,
@@ -69,20 +106,13 @@ class RAGRetrieverFactory:
                 "Install with: pip install langchain-milvus"
             )
 
-        embeddings = get_embeddings()
-
-        vector_store = Milvus(
-            embedding_function=embeddings,
-            collection_name=collection_name,
-            connection_args={
-                "host": settings.MILVUS_HOST,
-                "port": settings.MILVUS_PORT,
-            },
-        )
-
         default_kwargs: Dict[str, Any] = {"k": settings.RAG_TOP_K}
         if search_kwargs:
             default_kwargs.update(search_kwargs)
+        # 检索参数随 k 变化（ef >= k），按次传入而非固定在共享的向量存储上
+        default_kwargs.setdefault("param", default_search_params(default_kwargs["k"]))
+
+        vector_store = cls.get_vector_store(collection_name)
 
         return vector_store.as_retriever(
             search_type="similarity",
@@ -98,6 +128,7 @@ class RAGRetrieverFactory:
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
         brand: Optional[str] = None,
+        product_id: Optional[str] = None,
         top_k: Optional[int] = None,
     ) -> BaseRetriever:
         """
@@ -110,10 +141,11 @@ class RAGRetrieverFactory:
             min_price: 最低价格过滤
             max_price: 最高价格过滤
             brand: 品牌过滤
+            product_id: 商品 ID 过滤（reviews 集合）
             top_k: 返回结果数量
 
         Returns:
-            带过滤条件的 VectorStoreRetriever 实例
+            带过滤条件的 VectorStoreRetriever 实例（相同条件复用同一实例，调用方不应修改）
         """
         expr = build_filter_expr(
             category=category,
@@ -121,37 +153,54 @@ class RAGRetrieverFactory:
             min_price=min_price,
             max_price=max_price,
             brand=brand,
+            product_id=product_id,
         )
 
+        key = (collection_name, expr, top_k)
+        retriever = cls._filtered_retrievers.get(key)
+        if retriever is not None:
+            cls._filtered_retrievers.move_to_end(key)
+            return retriever
+
         search_kwargs: Dict[str, Any] = {}
         if top_k is not None:
             search_kwargs["k"] = top_k
         if expr is not None:
             search_kwargs["expr"] = expr
 
-        return cls.create_retriever(
+        retriever = cls.create_retriever(
             collection_name=collection_name,
             search_kwargs=search_kwargs if search_kwargs else None,
         )
+        cls._filtered_retrievers[key] = retriever
+        while len(cls._filtered_retrievers) > cls.FILTERED_RETRIEVER_CACHE_SIZE:
+            cls._filtered_retrievers.popitem(last=False)
+        return retriever
 
 
+@lru_cache(maxsize=512)
 def build_filter_expr(
     category: Optional[str] = None,
     floor: Optional[int] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     brand: Optional[str] = None,
+    product_id: Optional[str] = None,
     **kwargs
 ) -> Optional[str]:
     """
     构建 Milvus 过滤表达式
     
+    筛选组合高度重复（分类 + 楼层），结果按参数缓存。
+    字符串值经 json.dumps 转义为双引号字面量，防止表达式注入。
+    
     Args:
         category: 分类
         floor: 楼层
         min_price: 最低价格
         max_price: 最高价格
         brand: 品牌
+        product_id: 商品 ID
         
     Returns:
         过滤表达式字符串
@@ -159,7 +208,7 @@ def build_filter_expr(
     conditions = []
     
     if category:
-        conditions.append(f'category == "{category}"')
+        conditions.append(f"category == {json.dumps(category, ensure_ascii=False)}")
     
     if floor is not None:
         conditions.append(f"floor == {floor}")
@@ -171,7 +220,10 @@ def build_filter_expr(
         conditions.append(f"price <= {max_price}")
     
     if brand:
-        conditions.append(f'brand == "{brand}"')
+        conditions.append(f"brand == {json.dumps(brand, ensure_ascii=False)}")
+    
+    if product_id:
+        conditions.append(f"product_id == {json.dumps(str(product_id), ensure_ascii=False)}")
     
     if not conditions:
         return None
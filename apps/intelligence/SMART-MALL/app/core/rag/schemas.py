@@ -4,17 +4,50 @@ Milvus 集合 Schema 定义
 定义店铺、商品、位置等集合的数据结构
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from dataclasses import dataclass, field, asdict
 from pymilvus import CollectionSchema, FieldSchema, DataType
 from datetime import datetime
 import time
 
+import numpy as np
+import orjson
+
 from app.core.config import settings
 
 
 # ============ Embedding 维度 ============
 EMBEDDING_DIM = settings.EMBEDDING_DIMENSION
+VECTOR_DTYPE = DataType.FLOAT16_VECTOR if settings.MILVUS_VECTOR_FLOAT16 else DataType.FLOAT_VECTOR
+
+# 进程内向量表示：默认 float16（2 字节/维），EMBEDDING_ACCURACY_CRITICAL=True 时为 float32
+_IN_MEMORY_VECTOR_DTYPE = np.float32 if settings.EMBEDDING_ACCURACY_CRITICAL else np.float16
+
+
+def _compact_vector(value: Any) -> np.ndarray:
+    """把 Milvus 返回的向量转为紧凑的 numpy 数组（已是同类型数组时不复制）"""
+    if value is None:
+        return np.zeros(0, dtype=_IN_MEMORY_VECTOR_DTYPE)
+    return np.asarray(value, dtype=_IN_MEMORY_VECTOR_DTYPE)
+
+
+def l2_normalize(vectors: Any) -> np.ndarray:
+    """
+    按行 L2 归一化（单条向量或 (N, D) 矩阵），返回新的 float32 数组
+
+    写入与查询前各归一化一次后，余弦相似度等于内积，
+    MILVUS_METRIC_TYPE=IP 时 Milvus 无需在每次距离计算中再做归一化。
+    """
+    vecs = np.array(vectors, dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=-1, keepdims=True) + 1e-12
+    return vecs
+
+
+def _stack_vectors(docs: List[Any], embeddings: Optional[Any]) -> np.ndarray:
+    """把一批向量堆叠为连续的 (N, D) float32 矩阵并归一化，作为列式插入的向量列"""
+    if embeddings is None:
+        embeddings = [d.embedding for d in docs]
+    return l2_normalize(embeddings)
 
 
 # ============ 店铺集合 Schema ============
@@ -32,7 +65,7 @@ STORES_FIELDS = [
     FieldSchema(name="business_hours", dtype=DataType.VARCHAR, max_length=128),
     FieldSchema(name="rating", dtype=DataType.FLOAT),
     FieldSchema(name="tags", dtype=DataType.VARCHAR, max_length=512),  # JSON 字符串
-    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM),
+    FieldSchema(name="embedding", dtype=VECTOR_DTYPE, dim=EMBEDDING_DIM),
     FieldSchema(name="updated_at", dtype=DataType.INT64),
 ]
 
@@ -58,7 +91,7 @@ PRODUCTS_FIELDS = [
     FieldSchema(name="rating", dtype=DataType.FLOAT),
     FieldSchema(name="stock", dtype=DataType.INT64),
     FieldSchema(name="tags", dtype=DataType.VARCHAR, max_length=512),  # JSON 字符串
-    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM),
+    FieldSchema(name="embedding", dtype=VECTOR_DTYPE, dim=EMBEDDING_DIM),
     FieldSchema(name="updated_at", dtype=DataType.INT64),
 ]
 
@@ -80,7 +113,7 @@ REVIEWS_FIELDS = [
     FieldSchema(name="rating", dtype=DataType.FLOAT),
     FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=2048),
     FieldSchema(name="reply_content", dtype=DataType.VARCHAR, max_length=2048),
-    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM),
+    FieldSchema(name="embedding", dtype=VECTOR_DTYPE, dim=EMBEDDING_DIM),
     FieldSchema(name="updated_at", dtype=DataType.INT64),
 ]
 
@@ -102,7 +135,7 @@ LOCATIONS_FIELDS = [
     FieldSchema(name="position_y", dtype=DataType.FLOAT),
     FieldSchema(name="position_z", dtype=DataType.FLOAT),
     FieldSchema(name="description", dtype=DataType.VARCHAR, max_length=1024),
-    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM),
+    FieldSchema(name="embedding", dtype=VECTOR_DTYPE, dim=EMBEDDING_DIM),
     FieldSchema(name="updated_at", dtype=DataType.INT64),
 ]
 
@@ -139,7 +172,7 @@ class StoreDocument:
     business_hours: str = "09:00-22:00"
     rating: float = 0.0
     tags: List[str] = field(default_factory=list)
-    embedding: List[float] = field(default_factory=list)
+    embedding: Union[List[float], np.ndarray] = field(default_factory=list)
     updated_at: int = field(default_factory=lambda: int(time.time()))
     
     def to_text(self) -> str:
@@ -155,7 +188,6 @@ class StoreDocument:
     
     def to_milvus_dict(self) -> Dict[str, Any]:
         """转换为 Milvus 插入格式"""
-        import json
         return {
             "id": self.id,
             "name": self.name,
@@ -168,18 +200,45 @@ class StoreDocument:
             "position_z": self.position.z,
             "business_hours": self.business_hours,
             "rating": self.rating,
-            "tags": json.dumps(self.tags, ensure_ascii=False),
+            "tags": orjson.dumps(self.tags).decode(),
             "embedding": self.embedding,
             "updated_at": self.updated_at,
         }
     
+    @classmethod
+    def to_columnar(
+        cls, docs: List["StoreDocument"], embeddings: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """
+        批量转换为列式插入格式（字段顺序与 STORES_FIELDS 一致）
+        
+        Args:
+            docs: 店铺文档列表
+            embeddings: 与 docs 一一对应的向量（可选），默认使用文档自带的 embedding
+        """
+        return {
+            "id": [d.id for d in docs],
+            "name": [d.name for d in docs],
+            "description": [d.description for d in docs],
+            "category": [d.category for d in docs],
+            "floor": [d.floor for d in docs],
+            "area": [d.area for d in docs],
+            "position_x": [d.position.x for d in docs],
+            "position_y": [d.position.y for d in docs],
+            "position_z": [d.position.z for d in docs],
+            "business_hours": [d.business_hours for d in docs],
+            "rating": [d.rating for d in docs],
+            "tags": [orjson.dumps(d.tags).decode() for d in docs],
+            "embedding": _stack_vectors(docs, embeddings),
+            "updated_at": [d.updated_at for d in docs],
+        }
+    
     @classmethod
     def from_milvus_dict(cls, data: Dict[str, Any]) -> "StoreDocument":
         """从 Milvus 数据创建"""
-        import json
         tags = data.get("tags", "[]")
         if isinstance(tags, str):
-            tags = json.loads(tags) if tags else []
+            tags = orjson.loads(tags) if tags else []
         
         return cls(
             id=data["id"],
@@ -196,7 +255,7 @@ class StoreDocument:
             business_hours=data.get("business_hours", ""),
             rating=data.get("rating", 0),
             tags=tags,
-            embedding=data.get("embedding", []),
+            embedding=_compact_vector(data.get("embedding")),
             updated_at=data.get("updated_at", 0),
         )
 
@@ -216,7 +275,7 @@ class ProductDocument:
     rating: float = 0.0
     stock: int = 0
     tags: List[str] = field(default_factory=list)
-    embedding: List[float] = field(default_factory=list)
+    embedding: Union[List[float], np.ndarray] = field(default_factory=list)
     updated_at: int = field(default_factory=lambda: int(time.time()))
     
     def to_text(self) -> str:
@@ -234,7 +293,6 @@ class ProductDocument:
     
     def to_milvus_dict(self) -> Dict[str, Any]:
         """转换为 Milvus 插入格式"""
-        import json
         return {
             "id": self.id,
             "name": self.name,
@@ -247,18 +305,45 @@ class ProductDocument:
             "image_url": self.image_url,
             "rating": self.rating,
             "stock": self.stock,
-            "tags": json.dumps(self.tags, ensure_ascii=False),
+            "tags": orjson.dumps(self.tags).decode(),
             "embedding": self.embedding,
             "updated_at": self.updated_at,
         }
     
+    @classmethod
+    def to_columnar(
+        cls, docs: List["ProductDocument"], embeddings: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """
+        批量转换为列式插入格式（字段顺序与 PRODUCTS_FIELDS 一致）
+        
+        Args:
+            docs: 商品文档列表
+            embeddings: 与 docs 一一对应的向量（可选），默认使用文档自带的 embedding
+        """
+        return {
+            "id": [d.id for d in docs],
+            "name": [d.name for d in docs],
+            "description": [d.description for d in docs],
+            "category": [d.category for d in docs],
+            "brand": [d.brand for d in docs],
+            "price": [d.price for d in docs],
+            "store_id": [d.store_id for d in docs],
+            "store_name": [d.store_name for d in docs],
+            "image_url": [d.image_url for d in docs],
+            "rating": [d.rating for d in docs],
+            "stock": [d.stock for d in docs],
+            "tags": [orjson.dumps(d.tags).decode() for d in docs],
+            "embedding": _stack_vectors(docs, embeddings),
+            "updated_at": [d.updated_at for d in docs],
+        }
+    
     @classmethod
     def from_milvus_dict(cls, data: Dict[str, Any]) -> "ProductDocument":
         """从 Milvus 数据创建"""
-        import json
         tags = data.get("tags", "[]")
         if isinstance(tags, str):
-            tags = json.loads(tags) if tags else []
+            tags = orjson.loads(tags) if tags else []
         
         return cls(
             id=data["id"],
@@ -273,7 +358,7 @@ class ProductDocument:
             rating=data.get("rating", 0),
             stock=data.get("stock", 0),
             tags=tags,
-            embedding=data.get("embedding", []),
+            embedding=_compact_vector(data.get("embedding")),
             updated_at=data.get("updated_at", 0),
         )
 
@@ -287,7 +372,7 @@ class LocationDocument:
     floor: int = 1
     position: Position = field(default_factory=Position)
     description: str = ""
-    embedding: List[float] = field(default_factory=list)
+    embedding: Union[List[float], np.ndarray] = field(default_factory=list)
     updated_at: int = field(default_factory=lambda: int(time.time()))
     
     def to_text(self) -> str:
@@ -321,6 +406,30 @@ class LocationDocument:
             "updated_at": self.updated_at,
         }
     
+    @classmethod
+    def to_columnar(
+        cls, docs: List["LocationDocument"], embeddings: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """
+        批量转换为列式插入格式（字段顺序与 LOCATIONS_FIELDS 一致）
+        
+        Args:
+            docs: 位置文档列表
+            embeddings: 与 docs 一一对应的向量（可选），默认使用文档自带的 embedding
+        """
+        return {
+            "id": [d.id for d in docs],
+            "name": [d.name for d in docs],
+            "type": [d.type for d in docs],
+            "floor": [d.floor for d in docs],
+            "position_x": [d.position.x for d in docs],
+            "position_y": [d.position.y for d in docs],
+            "position_z": [d.position.z for d in docs],
+            "description": [d.description for d in docs],
+            "embedding": _stack_vectors(docs, embeddings),
+            "updated_at": [d.updated_at for d in docs],
+        }
+    
     @classmethod
     def from_milvus_dict(cls, data: Dict[str, Any]) -> "LocationDocument":
         """从 Milvus 数据创建"""
@@ -335,7 +444,7 @@ class LocationDocument:
                 z=data.get("position_z", 0)
             ),
             description=data.get("description", ""),
-            embedding=data.get("embedding", []),
+            embedding=_compact_vector(data.get("embedding")),
             updated_at=data.get("updated_at", 0),
         )
 
@@ -351,7 +460,7 @@ class ReviewDocument:
     rating: float = 0.0
     content: str = ""
     reply_content: str = ""
-    embedding: List[float] = field(default_factory=list)
+    embedding: Union[List[float], np.ndarray] = field(default_factory=list)
     updated_at: int = field(default_factory=lambda: int(time.time()))
 
     def to_text(self) -> str:
@@ -389,6 +498,6 @@ class ReviewDocument:
             rating=data.get("rating", 0.0),
             content=data.get("content", ""),
             reply_content=data.get("reply_content", ""),
-            embedding=data.get("embedding", []),
+            embedding=_compact_vector(data.get("embedding")),
             updated_at=data.get("updated_at", 0),
         )
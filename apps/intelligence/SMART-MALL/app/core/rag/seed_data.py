@@ -9,7 +9,7 @@
 所有数据包含 3D 坐标，与前端 Mall3DView 对应
 """
 
-from typing import List
+from typing import Sequence, Tuple
 from app.core.rag.schemas import StoreDocument, ProductDocument, LocationDocument, Position
 
 
@@ -17,7 +17,7 @@ from app.core.rag.schemas import StoreDocument, ProductDocument, LocationDocumen
 # 商城布局：3层，每层分 A/B/C 三个区域
 # 坐标系：x(-200~200), y(0~30), z(-200~200)
 
-SEED_STORES: List[StoreDocument] = [
+SEED_STORES: Tuple[StoreDocument, ...] = (
     # 1楼 - 服装区
     StoreDocument(
         id="store_nike_001",
@@ -173,12 +173,12 @@ SEED_STORES: List[StoreDocument] = [
         position=Position(x=150.0, y=20.0, z=50.0),
         tags=["餐饮", "奶茶", "茶饮", "面包", "奈雪"]
     ),
-]
+)
 
 
 # ============ 商品数据 ============
 
-SEED_PRODUCTS: List[ProductDocument] = [
+SEED_PRODUCTS: Tuple[ProductDocument, ...] = (
     # Nike 商品
     ProductDocument(
         id="prod_nike_001",
@@ -421,12 +421,12 @@ SEED_PRODUCTS: List[ProductDocument] = [
         store_name="丝芙兰",
         tags=["香水", "香奈儿", "经典"]
     ),
-]
+)
 
 
 # ============ 位置数据 ============
 
-SEED_LOCATIONS: List[LocationDocument] = [
+SEED_LOCATIONS: Tuple[LocationDocument, ...] = (
     # 楼层入口
     LocationDocument(
         id="loc_entrance_001",
@@ -536,7 +536,7 @@ SEED_LOCATIONS: List[LocationDocument] = [
         floor=1,
         position=Position(x=0.0, y=0.0, z=-100.0)
     ),
-]
+)
 
 
 async def seed_all_data():
@@ -549,6 +549,7 @@ async def seed_all_data():
     await seed_all_data()
     ```
     """
+    from app.core.rag.service import get_rag_service
     from app.core.rag.sync import get_sync_service
     
     sync_service = get_sync_service()
@@ -556,8 +557,10 @@ async def seed_all_data():
     results = await sync_service.full_sync_all(
         stores=SEED_STORES,
         products=SEED_PRODUCTS,
-        locations=SEED_LOCATIONS
+        locations=SEED_LOCATIONS,
+        cache_embeddings=True
     )
+    get_rag_service().invalidate_store_index()
     
     for result in results:
         print(f"Synced {result.collection}: {result.inserted} items in {result.duration_ms:.2f}ms")
@@ -565,16 +568,16 @@ async def seed_all_data():
     return results
 
 
-def get_seed_stores() -> List[StoreDocument]:
-    """获取示例店铺数据"""
-    return SEED_STORES.copy()
+def get_seed_stores() -> Sequence[StoreDocument]:
+    """获取示例店铺数据（只读元组，不再复制）"""
+    return SEED_STORES
 
 
-def get_seed_products() -> List[ProductDocument]:
-    """获取示例商品数据"""
-    return SEED_PRODUCTS.copy()
+def get_seed_products() -> Sequence[ProductDocument]:
+    """获取示例商品数据（只读元组，不再复制）"""
+    return SEED_PRODUCTS
 
 
-def get_seed_locations() -> List[LocationDocument]:
-    """获取示例位置数据"""
-    return SEED_LOCATIONS.copy()
+def get_seed_locations() -> Sequence[LocationDocument]:
+    """获取示例位置数据（只读元组，不再复制）"""
+    return SEED_LOCATIONS
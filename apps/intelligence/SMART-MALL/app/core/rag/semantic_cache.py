@@ -0,0 +1,104 @@
+"""
+语义缓存
+
+按查询向量的余弦相似度命中缓存：改写后的同义查询（如“便宜的跑鞋”/“实惠的跑鞋”）
+只要向量足够接近，就复用上一次的检索结果，跳过 Milvus 检索。
+
+实现为有界环形缓冲：向量归一化后存入矩阵（默认 float16，内存与扫描带宽减半；
+命中阈值在 0.9 以上，半精度的约 1e-3 误差不影响判定），容量按需倍增至上限，
+避免每个过滤组合都预分配满容量。查询时一次矩阵乘法得到与全部条目的相似度。
+条目数通常在千级以内，暴力扫描比维护 ANN 索引更简单且足够快。
+"""
+
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    基于向量相似度的有界缓存
+
+    - 容量满后按写入顺序覆盖最旧条目（FIFO）
+    - 条目超过 ttl 秒视为过期，不再命中
+    - 只在单个事件循环线程中使用，不加锁
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, max_entries: int, threshold: float, ttl: float, dtype: Any = np.float16):
+        """
+        Args:
+            max_entries: 最大条目数
+            threshold: 命中所需的最低余弦相似度
+            ttl: 条目有效期（秒）
+            dtype: 向量存储类型（np.float16 / np.float32）
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.dtype = dtype
+        self._vectors: Optional[np.ndarray] = None  # (capacity, D)，懒分配，按需扩容
+        self._values: List[Any] = [None] * max_entries
+        self._created_at = np.zeros(max_entries, dtype=np.float64)
+        self._size = 0
+        self._next = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> Optional[np.ndarray]:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return None
+        return vec / norm
+
+    def get(self, vector: List[float]) -> Optional[Any]:
+        """查找与 vector 最相似且未过期的条目，相似度不足阈值时返回 None"""
+        if self._size == 0:
+            return None
+        query = self._normalize(vector)
+        if query is None or query.shape[0] != self._vectors.shape[1]:
+            return None
+
+        sims = self._vectors[:self._size] @ query
+        expired = self._created_at[:self._size] < time.monotonic() - self.ttl
+        sims[expired] = -1.0
+
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        return self._values[best]
+
+    def put(self, vector: List[float], value: Any) -> None:
+        """写入条目，容量满时覆盖最旧条目"""
+        vec = self._normalize(vector)
+        if vec is None:
+            return
+        if self._vectors is None or self._vectors.shape[1] != vec.shape[0]:
+            capacity = min(self.INITIAL_CAPACITY, self.max_entries)
+            self._vectors = np.zeros((capacity, vec.shape[0]), dtype=self.dtype)
+            self._size = 0
+            self._next = 0
+
+        slot = self._next
+        if slot >= self._vectors.shape[0]:
+            # 未写满前 slot == size，容量不足时倍增（不超过 max_entries）
+            grown = np.zeros((min(2 * slot, self.max_entries), self._vectors.shape[1]), dtype=self.dtype)
+            grown[:slot] = self._vectors
+            self._vectors = grown
+
+        self._vectors[slot] = vec
+        self._values[slot] = value
+        self._created_at[slot] = time.monotonic()
+        self._next = (slot + 1) % self.max_entries
+        self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._values = [None] * self.max_entries
+        self._size = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self._size
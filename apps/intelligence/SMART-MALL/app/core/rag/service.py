@@ -36,21 +36,33 @@ RAG Service 核心服务模块
     ```
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
+from collections import OrderedDict
 from dataclasses import dataclass
+import asyncio
+import heapq
 import logging
+import threading
+import time
+import unicodedata
+
+import numpy as np
 
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 
 # Milvus 向量数据库客户端
-from app.core.rag.milvus_client import MilvusClient, get_milvus_client
+from app.core.rag.milvus_client import MilvusClient, SearchResult, get_milvus_client
 # 文本向量化服务（旧版，仅用于 DataSyncService 兼容）
 from app.core.rag.embedding import EmbeddingService, get_embedding_service
 # 检索器和过滤表达式构建器
 from app.core.rag.retriever import build_filter_expr, RAGRetrieverFactory
 # 数据库集合的 Schema 定义
-from app.core.rag.schemas import STORES_SCHEMA, PRODUCTS_SCHEMA, LOCATIONS_SCHEMA, REVIEWS_SCHEMA
+from app.core.rag.schemas import STORES_SCHEMA, PRODUCTS_SCHEMA, LOCATIONS_SCHEMA, REVIEWS_SCHEMA, l2_normalize
+# 语义缓存（相似查询复用检索结果）
+from app.core.rag.semantic_cache import SemanticCache
+# 检索熔断器
+from app.core.rag.circuit_breaker import CircuitBreaker
 # 应用配置
 from app.core.config import settings
 
@@ -58,7 +70,7 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class StoreSearchResult:
     """
     店铺搜索结果数据类
@@ -148,7 +160,7 @@ class StoreSearchResult:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ProductSearchResult:
     """
     商品搜索结果数据类
@@ -321,7 +333,19 @@ class RAGService:
         self._milvus_client = milvus_client
         self._embedding_service = embedding_service
         self._initialized = False  # 初始化标志，防止重复初始化
+        self._init_lock = asyncio.Lock()  # 串行化并发的 initialize() 调用
         self._retrievers: Dict[str, BaseRetriever] = {}  # Retriever 缓存
+        # 语义缓存：(集合, 过滤表达式, top_k) -> SemanticCache，按 LRU 保留 DOC_CACHE_MAX_KEYS 个
+        self._doc_caches: "OrderedDict[Tuple[str, Optional[str], int], SemanticCache]" = OrderedDict()
+        # 按集合划分的检索熔断器：某集合持续失败时跳过其检索，不拖累其他集合
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # 店铺名精确匹配索引：归一化店铺名 -> 预先构建的导航结果，导航时先查此表再走语义检索
+        self._store_name_index: Dict[str, Dict[str, Any]] = {}
+        # 名称未精确命中、经语义检索解析出的导航结果（如简称“星巴”），随索引刷新一并清空
+        self._store_alias_index: Dict[str, Dict[str, Any]] = {}
+        # 店铺内存索引中出现过的 (分类, 楼层) 组合，用于判定过滤条件是否必然无结果
+        self._store_filter_keys: Optional[Set[Tuple[str, int]]] = None
+        self._store_index_at: Optional[float] = None
     
     @property
     def milvus_client(self) -> MilvusClient:
@@ -390,6 +414,47 @@ class RAGService:
         hits = sum(1 for t in terms if t in lowered)
         return min(1.0, 0.45 + 0.12 * hits)
 
+    @staticmethod
+    def _to_store_result(meta: Dict[str, Any], score: float) -> StoreSearchResult:
+        """检索元数据 -> StoreSearchResult"""
+        return StoreSearchResult(
+            id=meta.get("id", ""),
+            name=meta.get("name", ""),
+            category=meta.get("category", ""),
+            description=meta.get("description", ""),
+            floor=meta.get("floor", 0),
+            area=meta.get("area", ""),
+            position_x=meta.get("position_x", 0.0),
+            position_y=meta.get("position_y", 0.0),
+            position_z=meta.get("position_z", 0.0),
+            score=score
+        )
+
+    @staticmethod
+    def _to_product_result(meta: Dict[str, Any], score: float) -> ProductSearchResult:
+        """检索元数据 -> ProductSearchResult"""
+        return ProductSearchResult(
+            id=meta.get("id", ""),
+            name=meta.get("name", ""),
+            brand=meta.get("brand", ""),
+            category=meta.get("category", ""),
+            description=meta.get("description", ""),
+            price=meta.get("price", 0.0),
+            store_id=meta.get("store_id", ""),
+            store_name=meta.get("store_name", ""),
+            score=score,
+        )
+
+    def _top_results(self, query: str, results: List[Any], top_k: int) -> List[Any]:
+        """取前 top_k 个结果；启用重排序时按 相似度 + 词面匹配加分 排序"""
+        if settings.RAG_RERANK_ENABLED and results:
+            return heapq.nlargest(
+                top_k,
+                results,
+                key=lambda x: x.score + self._lexical_bonus(query, f"{x.name} {x.description}"),
+            )
+        return results[:top_k]
+
     @staticmethod
     def _lexical_bonus(query: str, text: str) -> float:
         terms = [t for t in query.lower().split() if t]
@@ -398,6 +463,81 @@ class RAGService:
         lowered = text.lower()
         hits = sum(1 for t in terms if t in lowered)
         return min(0.08, 0.02 * hits)
+
+    # 语义缓存分组数上限：价格区间等任意过滤值会产生无限多的组合，每组最多占 max_entries × D 的矩阵
+    DOC_CACHE_MAX_KEYS = 64
+
+    def _get_doc_cache(self, key: Tuple[str, Optional[str], int]) -> SemanticCache:
+        cache = self._doc_caches.get(key)
+        if cache is not None:
+            self._doc_caches.move_to_end(key)
+        else:
+            cache = SemanticCache(
+                max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                ttl=settings.RAG_CACHE_TTL,
+                dtype=np.float32 if settings.EMBEDDING_ACCURACY_CRITICAL else np.float16,
+            )
+            self._doc_caches[key] = cache
+            while len(self._doc_caches) > self.DOC_CACHE_MAX_KEYS:
+                self._doc_caches.popitem(last=False)
+        return cache
+
+    @staticmethod
+    async def _no_results() -> List[Any]:
+        return []
+
+    async def _embed_query(self, query: str) -> Optional[List[float]]:
+        """
+        经 EmbeddingService（LRU + Redis 缓存、并发合批）生成查询向量，失败时返回 None
+
+        查询先做空白归一化（去首尾空白、合并连续空白），
+        使仅空白不同的重复查询命中同一缓存条目；
+        向量在此 L2 归一化一次，与写入侧一致（IP 度量下内积即余弦相似度）。
+        """
+        try:
+            vector = await self.embedding_service.embed_text(" ".join(query.split()))
+            return l2_normalize(vector).tolist()
+        except Exception as e:
+            logger.debug("Query embedding failed, retriever will embed: %s", e)
+            return None
+
+    async def _retrieve_documents(
+        self,
+        collection_name: str,
+        query: str,
+        top_k: int,
+        query_vector: Optional[List[float]] = None,
+        **filters: Any,
+    ) -> List[Document]:
+        """
+        带语义缓存的过滤检索
+
+        查询向量可由调用方传入（多路检索共用一次 Embedding），否则经
+        EmbeddingService 生成，检索时直接按向量查询，不再由 Retriever 重复向量化。
+
+        启用 SEMANTIC_CACHE_ENABLED 时，按 (集合, 过滤表达式, top_k) 划分语义缓存：
+        查询向量与缓存条目足够相似时直接复用上次的 Document 列表，跳过 Milvus 检索。
+        """
+        retriever = RAGRetrieverFactory.create_filtered_retriever(
+            collection_name=collection_name,
+            top_k=top_k,
+            **filters,
+        )
+        if query_vector is None:
+            query_vector = await self._embed_query(query)
+
+        cache = None
+        if settings.SEMANTIC_CACHE_ENABLED and query_vector is not None:
+            cache = self._get_doc_cache((collection_name, build_filter_expr(**filters), top_k))
+            cached = cache.get(query_vector)
+            if cached is not None:
+                return list(cached)
+
+        documents = await self._search_by_vector(retriever, query, query_vector)
+        if cache is not None:
+            cache.put(query_vector, documents)
+        return list(documents)
     
     async def initialize(self) -> bool:
         """
@@ -441,21 +581,26 @@ class RAGService:
         if self._initialized:
             return True
         
-        try:
-            # 连接 Milvus（同步方法）
-            self.milvus_client.connect()
+        # 并发的首次请求只执行一次初始化，其余等待后直接复用结果
+        async with self._init_lock:
+            if self._initialized:
+                return True
             
-            # 创建集合（如果不存在）
-            self._ensure_collections()
-            
-            # 设置初始化标志
-            self._initialized = True
-            logger.info("RAG Service initialized successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize RAG Service: {e}")
-            return False
+            try:
+                # 连接与建集合均为阻塞 RPC，放到线程中执行，避免卡住事件循环
+                await asyncio.to_thread(self.milvus_client.connect)
+                
+                # 创建集合（如果不存在）
+                await asyncio.to_thread(self._ensure_collections)
+                
+                # 设置初始化标志
+                self._initialized = True
+                logger.info("RAG Service initialized successfully")
+                return True
+                
+            except Exception as e:
+                logger.error("Failed to initialize RAG Service: %s", e)
+                return False
     
     def _ensure_collections(self):
         """
@@ -470,13 +615,13 @@ class RAGService:
         集合创建是幂等的，已存在的集合不会被重复创建。
         
         工作流程：
-        1. 遍历所有需要的集合
-        2. 检查集合是否存在
+        1. 一次 list_collections 获取已有集合
+        2. 遍历所有需要的集合
         3. 如果不存在，使用预定义的 Schema 创建集合
         4. 记录创建日志
         
         注意事项：
-        - 这是一个同步方法
+        - 这是一个同步方法（initialize() 在线程中调用）
         - Schema 定义在 schemas.py 中
         - 如果创建失败会抛出异常，由 initialize() 捕获
         """
@@ -488,20 +633,23 @@ class RAGService:
             ("reviews", REVIEWS_SCHEMA), # 评价集合
         ]
         
+        # 一次 RPC 取得全部已有集合，代替逐个 has_collection
+        existing = set(self.milvus_client.list_collections())
+        
         # 遍历并创建集合
         for name, schema in collections:
-            exists = self.milvus_client.has_collection(name)
-            if not exists:
+            if name not in existing:
                 self.milvus_client.create_collection(name, schema)
-                logger.info(f"Created collection: {name}")
+                logger.info("Created collection: %s", name)
     
     async def search_stores(
         self,
         query: str,
         category: Optional[str] = None,
         floor: Optional[int] = None,
-        top_k: int = None,
-        score_threshold: float = None
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+        query_vector: Optional[List[float]] = None
     ) -> List[StoreSearchResult]:
         """
         搜索店铺（语义搜索 + 条件过滤）
@@ -579,48 +727,37 @@ class RAGService:
         - 如果没有匹配结果，返回空列表
         - 相似度得分越高表示越相关
         """
-        # 使用配置的默认值
-        top_k = top_k or settings.RAG_TOP_K
-        score_threshold = score_threshold or settings.RAG_SCORE_THRESHOLD
+        # 使用配置的默认值（显式传入 0 / 0.0 时保留，不回退默认值）
+        if top_k is None:
+            top_k = settings.RAG_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.RAG_SCORE_THRESHOLD
         
-        # 使用 RAGRetrieverFactory 创建检索器
-        retriever = RAGRetrieverFactory.create_filtered_retriever(
-            collection_name="stores",
+        # 过滤条件确定无店铺时直接返回，不做 Embedding 与向量检索
+        if await self._store_filter_is_empty(category, floor):
+            return []
+        
+        # 执行检索（带语义缓存）
+        documents = await self._retrieve_documents(
+            "stores",
+            query,
+            top_k,
+            query_vector,
             category=category,
             floor=floor,
-            top_k=top_k,
         )
         
-        # 执行检索
-        documents = await retriever.ainvoke(query)
-        
         # 将 LangChain Document 转换为 StoreSearchResult 对象
         results = []
         for doc in documents:
             meta = doc.metadata  # 提取元数据
             text_for_score = f"{meta.get('name', '')} {meta.get('description', '')}"
             score = self._resolve_similarity_score(meta, query, text_for_score)
-            result = StoreSearchResult(
-                id=meta.get("id", ""),
-                name=meta.get("name", ""),
-                category=meta.get("category", ""),
-                description=meta.get("description", ""),
-                floor=meta.get("floor", 0),
-                area=meta.get("area", ""),
-                position_x=meta.get("position_x", 0.0),
-                position_y=meta.get("position_y", 0.0),
-                position_z=meta.get("position_z", 0.0),
-                score=score
-            )
-            if result.score >= score_threshold:
-                results.append(result)
+            if score < score_threshold:
+                continue
+            results.append(self._to_store_result(meta, score))
 
-        if settings.RAG_RERANK_ENABLED and results:
-            results.sort(
-                key=lambda x: x.score + self._lexical_bonus(query, f"{x.name} {x.description}"),
-                reverse=True,
-            )
-        return results[:top_k]
+        return self._top_results(query, results, top_k)
     
     async def search_products(
         self,
@@ -629,8 +766,9 @@ class RAGService:
         brand: Optional[str] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
-        top_k: int = None,
-        score_threshold: float = None
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None,
+        query_vector: Optional[List[float]] = None
     ) -> List[ProductSearchResult]:
         """
         搜索商品
@@ -647,49 +785,160 @@ class RAGService:
         Returns:
             商品搜索结果列表
         """
-        top_k = top_k or settings.RAG_TOP_K
-        score_threshold = score_threshold or settings.RAG_SCORE_THRESHOLD
+        if top_k is None:
+            top_k = settings.RAG_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.RAG_SCORE_THRESHOLD
         
-        # 使用 RAGRetrieverFactory 创建检索器
-        retriever = RAGRetrieverFactory.create_filtered_retriever(
-            collection_name="products",
+        # 执行检索（带语义缓存）
+        documents = await self._retrieve_documents(
+            "products",
+            query,
+            top_k,
+            query_vector,
             category=category,
             brand=brand,
             min_price=min_price,
             max_price=max_price,
-            top_k=top_k,
         )
         
-        # 执行检索
-        documents = await retriever.ainvoke(query)
-        
         # 转换为结果对象
         results = []
         for doc in documents:
             meta = doc.metadata
             text_for_score = f"{meta.get('name', '')} {meta.get('description', '')}"
             score = self._resolve_similarity_score(meta, query, text_for_score)
-            result = ProductSearchResult(
-                id=meta.get("id", ""),
-                name=meta.get("name", ""),
-                brand=meta.get("brand", ""),
-                category=meta.get("category", ""),
-                description=meta.get("description", ""),
-                price=meta.get("price", 0.0),
-                store_id=meta.get("store_id", ""),
-                store_name=meta.get("store_name", ""),
-                score=score,
-            )
-            if result.score >= score_threshold:
-                results.append(result)
+            if score < score_threshold:
+                continue
+            results.append(self._to_product_result(meta, score))
 
-        if settings.RAG_RERANK_ENABLED and results:
-            results.sort(
-                key=lambda x: x.score + self._lexical_bonus(query, f"{x.name} {x.description}"),
-                reverse=True,
+        return self._top_results(query, results, top_k)
+    
+    async def batch_search_stores(
+        self,
+        queries: List[str],
+        category: Optional[str] = None,
+        floor: Optional[int] = None,
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None
+    ) -> List[List[StoreSearchResult]]:
+        """
+        批量搜索店铺
+        
+        全部查询一次批量 Embedding，再以一次 Milvus 多向量检索完成，
+        比逐条调用 search_stores 少 N-1 次 Embedding 与检索往返。
+        不经过语义缓存，过滤条件对所有查询生效。
+        
+        Args:
+            queries: 查询列表
+            category: 店铺分类过滤
+            floor: 楼层过滤
+            top_k: 每个查询的返回数量
+            score_threshold: 相似度阈值
+            
+        Returns:
+            与 queries 一一对应的结果列表（空白查询对应空列表）
+        """
+        if top_k is None:
+            top_k = settings.RAG_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.RAG_SCORE_THRESHOLD
+        
+        batches = await self._batch_search(
+            "stores", queries, top_k, build_filter_expr(category=category, floor=floor)
+        )
+        return [
+            self._top_results(
+                query,
+                [self._to_store_result(hit.data, hit.score) for hit in hits if hit.score >= score_threshold],
+                top_k,
             )
-        return results[:top_k]
+            for query, hits in zip(queries, batches)
+        ]
+    
+    async def batch_search_products(
+        self,
+        queries: List[str],
+        category: Optional[str] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        top_k: Optional[int] = None,
+        score_threshold: Optional[float] = None
+    ) -> List[List[ProductSearchResult]]:
+        """
+        批量搜索商品（一次 Embedding + 一次多向量检索，参见 batch_search_stores）
+        
+        Returns:
+            与 queries 一一对应的结果列表（空白查询对应空列表）
+        """
+        if top_k is None:
+            top_k = settings.RAG_TOP_K
+        if score_threshold is None:
+            score_threshold = settings.RAG_SCORE_THRESHOLD
+        
+        expr = build_filter_expr(
+            category=category, brand=brand, min_price=min_price, max_price=max_price
+        )
+        batches = await self._batch_search("products", queries, top_k, expr)
+        return [
+            self._top_results(
+                query,
+                [self._to_product_result(hit.data, hit.score) for hit in hits if hit.score >= score_threshold],
+                top_k,
+            )
+            for query, hits in zip(queries, batches)
+        ]
+    
+    async def _batch_search(
+        self,
+        collection_name: str,
+        queries: List[str],
+        top_k: int,
+        expr: Optional[str]
+    ) -> List[List[SearchResult]]:
+        """批量向量化并以一次多向量检索查询，返回与 queries 对齐的命中列表"""
+        normalized = [" ".join(q.split()) for q in queries]
+        # 空白查询不参与 Embedding（embed_batch 会丢弃空文本，导致结果错位）
+        positions = [i for i, q in enumerate(normalized) if q]
+        batches: List[List[SearchResult]] = [[] for _ in queries]
+        if not positions:
+            return batches
+        
+        vectors = await self.embedding_service.embed_batch([normalized[i] for i in positions])
+        hits = await self.milvus_client.search_batch_async(
+            collection_name, l2_normalize(vectors), top_k=top_k, filters=expr
+        )
+        for i, result in zip(positions, hits):
+            batches[i] = result
+        return batches
     
+    @staticmethod
+    def _iter_context_lines(
+        stores: List[StoreSearchResult], products: List[ProductSearchResult]
+    ):
+        """逐行生成上下文文本（惰性生成，调用方可在超出长度上限时提前停止）"""
+        # 格式化店铺信息
+        if stores:
+            yield "【相关店铺】\n"
+            for i, store in enumerate(stores, 1):
+                # 格式：序号. 店铺名（分类）- 楼层区域
+                yield f"{i}. {store.name}（{store.category}）- {store.floor}楼{store.area}\n"
+                # 添加描述（截断到 50 字符）
+                if store.description:
+                    yield f"   {store.description[:50]}...\n"
+        
+        # 格式化商品信息（与店铺部分之间空一行）
+        if products:
+            if stores:
+                yield "\n"
+            yield "【相关商品】\n"
+            for i, product in enumerate(products, 1):
+                # 格式：序号. 商品名（品牌） - 价格 @ 店铺
+                brand = f"（{product.brand}）" if product.brand else ""
+                shop = f" @ {product.store_name}" if product.store_name else ""
+                yield f"{i}. {product.name}{brand} - ¥{product.price}{shop}\n"
+
     async def get_context_for_query(
         self,
         query: str,
@@ -783,39 +1032,24 @@ class RAGService:
         - 描述信息会被截断到 50 字符
         - 上下文格式是为 LLM 优化的，易于理解和解析
         """
-        context_parts = []
+        # 查询只向量化一次，店铺与商品并发检索
+        query_vector = await self._embed_query(query)
+        stores, products = await asyncio.gather(
+            self.search_stores(query, top_k=3, query_vector=query_vector)
+            if include_stores else self._no_results(),
+            self.search_products(query, top_k=5, query_vector=query_vector)
+            if include_products else self._no_results(),
+        )
         
-        # 检索并格式化店铺信息
-        if include_stores:
-            stores = await self.search_stores(query, top_k=3)
-            if stores:
-                store_context = "【相关店铺】\n"
-                for i, store in enumerate(stores, 1):
-                    # 格式：序号. 店铺名（分类）- 楼层区域
-                    store_context += f"{i}. {store.name}（{store.category}）- {store.floor}楼{store.area}\n"
-                    # 添加描述（截断到 50 字符）
-                    if store.description:
-                        store_context += f"   {store.description[:50]}...\n"
-                context_parts.append(store_context)
-        
-        # 检索并格式化商品信息
-        if include_products:
-            products = await self.search_products(query, top_k=5)
-            if products:
-                product_context = "【相关商品】\n"
-                for i, product in enumerate(products, 1):
-                    # 格式：序号. 商品名（品牌） - 价格 @ 店铺
-                    product_context += f"{i}. {product.name}"
-                    if product.brand:
-                        product_context += f"（{product.brand}）"
-                    product_context += f" - ¥{product.price}"
-                    if product.store_name:
-                        product_context += f" @ {product.store_name}"
-                    product_context += "\n"
-                context_parts.append(product_context)
-        
-        # 合并所有上下文部分
-        context = "\n".join(context_parts)
+        # 逐行拼接，累计长度超出上限后不再格式化剩余结果
+        lines = []
+        length = 0
+        for line in self._iter_context_lines(stores, products):
+            lines.append(line)
+            length += len(line)
+            if length > max_context_length:
+                break
+        context = "".join(lines)
         
         # 截断过长的上下文
         if len(context) > max_context_length:
@@ -823,6 +1057,119 @@ class RAGService:
         
         return context
     
+    # 导航别名缓存的最大条目数
+    STORE_ALIAS_CACHE_SIZE = 1024
+
+    @staticmethod
+    def _normalize_store_name(name: str) -> str:
+        """店铺名归一化：NFKC（全角转半角等）、去除空白、转小写"""
+        return "".join(unicodedata.normalize("NFKC", name).split()).lower()
+
+    async def _refresh_store_index(self) -> bool:
+        """
+        按需刷新店铺内存索引，返回索引是否可用
+
+        索引通过标量查询从 stores 集合整体加载，每 RAG_STORE_INDEX_TTL 秒刷新一次；
+        同步写入后由 invalidate_store_index() 立即失效。加载失败时索引不可用，
+        调用方退回向量检索。
+        """
+        ttl = settings.RAG_STORE_INDEX_TTL
+        if ttl <= 0:
+            return False
+
+        now = time.monotonic()
+        if self._store_index_at is None or now - self._store_index_at >= ttl:
+            # 失败时也更新时间戳，避免 Milvus 不可用时每次请求都重试加载
+            self._store_index_at = now
+            limit = 16384  # Milvus 单次 query 的返回上限
+            try:
+                rows = await self.milvus_client.query_async(
+                    "stores",
+                    'id != ""',
+                    output_fields=[
+                        "id", "name", "category", "description", "floor", "area",
+                        "position_x", "position_y", "position_z",
+                    ],
+                    limit=limit,
+                )
+            except Exception as e:
+                logger.debug("Store index load failed, falling back to search: %s", e)
+                self._store_filter_keys = None
+                return bool(self._store_name_index)
+            # 导航结果在加载时一次构建，命中时直接返回，不再逐次构造嵌套字典
+            self._store_name_index = {
+                self._normalize_store_name(row["name"]): self._navigation_result(StoreSearchResult(
+                    id=row["id"],
+                    name=row["name"],
+                    category=row.get("category", ""),
+                    description=row.get("description", ""),
+                    floor=row.get("floor", 0),
+                    area=row.get("area", ""),
+                    position_x=row.get("position_x", 0.0),
+                    position_y=row.get("position_y", 0.0),
+                    position_z=row.get("position_z", 0.0),
+                    score=1.0,
+                ))
+                for row in rows
+                if row.get("name")
+            }
+            # 集合为空（尚未导入数据）或结果被截断时，无法断定过滤结果为空
+            if rows and len(rows) < limit:
+                self._store_filter_keys = {(row.get("category", ""), row.get("floor", 0)) for row in rows}
+            else:
+                self._store_filter_keys = None
+            self._store_alias_index = {}
+        return True
+
+    def invalidate_store_index(self) -> None:
+        """使店铺内存索引失效，下次使用时重新加载（stores 集合写入后调用）"""
+        self._store_index_at = None
+        # 导航结果与别名缓存一并丢弃：重新加载失败时也不再返回已改名、搬迁或删除店铺的旧位置
+        self._store_name_index = {}
+        self._store_alias_index = {}
+        # 语义缓存中的 RAG 证据同样来自旧数据，一并清空
+        from app.core.rag.orchestrator import RAGOrchestrator
+
+        RAGOrchestrator.clear_semantic_caches()
+
+    @staticmethod
+    def _navigation_result(store: StoreSearchResult) -> Dict[str, Any]:
+        """构建 navigate_to_store 的返回结果"""
+        return {
+            "success": True,
+            "store": store.to_dict(),
+            "message": f"{store.name} 位于 {store.floor} 楼 {store.area}"
+        }
+
+    async def _lookup_store_by_name(self, store_name: str) -> Optional[Dict[str, Any]]:
+        """
+        按店铺名精确查找，返回预先构建的导航结果（调用方只读），未命中返回 None
+
+        导航请求大多是完整店铺名（如“星巴克”），查表即可命中，
+        省去一次 Embedding 调用和一次向量检索。
+        """
+        if not await self._refresh_store_index():
+            return None
+        key = self._normalize_store_name(store_name)
+        return self._store_name_index.get(key) or self._store_alias_index.get(key)
+
+    async def _store_filter_is_empty(self, category: Optional[str], floor: Optional[int]) -> bool:
+        """
+        分类/楼层过滤条件是否确定没有任何店铺
+
+        LLM 生成的分类常常不存在（如“数码”而非“电子产品”），此时向量检索必然为空，
+        查索引即可提前返回，省去 Embedding 与 Milvus 检索。索引不可用时返回 False。
+        """
+        # 与 build_filter_expr 保持一致：空字符串分类视为不过滤
+        if not category and floor is None:
+            return False
+        if not await self._refresh_store_index() or self._store_filter_keys is None:
+            return False
+        return not any(
+            (not category or c == category) and (floor is None or f == floor)
+            for c, f in self._store_filter_keys
+        )
+
     async def navigate_to_store(self, store_name: str) -> Optional[Dict[str, Any]]:
         """
         导航到店铺
@@ -833,35 +1180,40 @@ class RAGService:
         Returns:
             店铺信息（包含位置）
         """
-        results = await self.search_stores(store_name, top_k=1)
+        cached = await self._lookup_store_by_name(store_name)
+        if cached is not None:
+            return cached
         
+        # 名称未精确命中（简称、错别字等），退回语义检索
+        results = await self.search_stores(store_name, top_k=1)
         if not results:
             return None
+        result = self._navigation_result(results[0])
         
-        store = results[0]
-        return {
-            "success": True,
-            "store": store.to_dict(),
-            "message": f"{store.name} 位于 {store.floor} 楼 {store.area}"
-        }
+        # 记住本次解析结果，同一叫法再次导航时直接查表（条目数有上限，防止任意输入撑大内存）
+        if (
+            settings.RAG_STORE_INDEX_TTL > 0
+            and len(self._store_alias_index) < self.STORE_ALIAS_CACHE_SIZE
+        ):
+            self._store_alias_index[self._normalize_store_name(store_name)] = result
+        return result
 
     async def search_reviews(
         self,
         query: str,
         product_id: Optional[str] = None,
-        top_k: int = None,
+        top_k: Optional[int] = None,
     ) -> List[Document]:
         """检索商品评价"""
-        top_k = top_k or settings.RAG_TOP_K
-        search_kwargs: Dict[str, Any] = {"k": top_k}
-        if product_id:
-            search_kwargs["expr"] = f'product_id == "{product_id}"'
-
-        retriever = RAGRetrieverFactory.create_retriever(
+        if top_k is None:
+            top_k = settings.RAG_TOP_K
+        # 相同 (商品, top_k) 复用缓存的 Retriever，不再每次调用新建
+        retriever = RAGRetrieverFactory.create_filtered_retriever(
             collection_name="reviews",
-            search_kwargs=search_kwargs,
+            product_id=product_id,
+            top_k=top_k,
         )
-        return await retriever.ainvoke(query)
+        return await self._search_by_vector(retriever, query, await self._embed_query(query))
     
     # ================================================================
     # RAG 数据隔离方法（world_facts / reviews / rules）
@@ -870,18 +1222,49 @@ class RAGService:
     # world_facts 集合映射：stores, products, locations
     WORLD_FACTS_COLLECTIONS = ["stores", "products", "locations"]
 
+    def _get_breaker(self, collection: str) -> CircuitBreaker:
+        breaker = self._breakers.get(collection)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=settings.RAG_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.RAG_BREAKER_RESET_TIMEOUT,
+            )
+            self._breakers[collection] = breaker
+        return breaker
+
     def _get_retriever(self, collection: str) -> BaseRetriever:
         """获取指定集合的 Retriever（带缓存）"""
         if collection not in self._retrievers:
             self._retrievers[collection] = RAGRetrieverFactory.create_retriever(collection)
         return self._retrievers[collection]
 
+    @staticmethod
+    async def _search_by_vector(
+        retriever: BaseRetriever, query: str, query_vector: Optional[List[float]]
+    ) -> List[Document]:
+        """用预先计算的查询向量检索；无向量或非 VectorStoreRetriever 时退回 ainvoke"""
+        vectorstore = getattr(retriever, "vectorstore", None)
+        if query_vector is None or vectorstore is None:
+            return await retriever.ainvoke(query)
+        search_kwargs = dict(retriever.search_kwargs)
+        k = search_kwargs.pop("k", settings.RAG_TOP_K)
+        return await vectorstore.asimilarity_search_by_vector(query_vector, k=k, **search_kwargs)
+
     async def _search_world_facts(
-        self, query: str, filters: Optional[Dict[str, Any]] = None
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        query_vector: Optional[List[float]] = None,
     ) -> List[Document]:
-        """检索 world_facts（stores + products + locations）"""
-        all_docs: List[Document] = []
+        """
+        检索 world_facts（stores + products + locations）
+
+        查询只向量化一次，三个集合的检索并发执行，总耗时取决于最慢的一路。
+        """
+        retrievers: List[Tuple[str, BaseRetriever]] = []
         for collection in self.WORLD_FACTS_COLLECTIONS:
+            if not self._get_breaker(collection).allow():
+                continue
             try:
                 if filters:
                     retriever = RAGRetrieverFactory.create_filtered_retriever(
@@ -889,40 +1272,71 @@ class RAGService:
                     )
                 else:
                     retriever = self._get_retriever(collection)
-                docs = await retriever.ainvoke(query)
-                for doc in docs:
-                    doc.metadata["source_type"] = "world_facts"
-                    doc.metadata["source_collection"] = collection
-                all_docs.extend(docs)
+                retrievers.append((collection, retriever))
             except Exception as e:
-                logger.warning(f"Failed to search {collection}: {e}")
+                logger.warning("Failed to search %s: %s", collection, e)
+        if not retrievers:
+            return []
+
+        if query_vector is None:
+            query_vector = await self._embed_query(query)
+
+        results = await asyncio.gather(
+            *(self._search_by_vector(r, query, query_vector) for _, r in retrievers),
+            return_exceptions=True,
+        )
+
+        all_docs: List[Document] = []
+        for (collection, _), docs in zip(retrievers, results):
+            if isinstance(docs, Exception):
+                self._get_breaker(collection).record_failure()
+                logger.warning("Failed to search %s: %s", collection, docs)
+                continue
+            self._get_breaker(collection).record_success()
+            for doc in docs:
+                doc.metadata["source_type"] = "world_facts"
+                doc.metadata["source_collection"] = collection
+            all_docs.extend(docs)
         return all_docs
 
-    async def _search_reviews(self, query: str) -> List[Document]:
-        """检索 reviews 集合"""
+    async def _search_tagged(
+        self, collection: str, query: str, query_vector: Optional[List[float]] = None
+    ) -> List[Document]:
+        """
+        检索单个集合并标注来源（source_type 与集合同名）
+
+        RAG 只是聊天链路的增强，检索失败时返回空列表而不是中断对话；
+        失败同时计入该集合的熔断器，熔断打开期间直接跳过检索。
+        """
+        breaker = self._get_breaker(collection)
+        if not breaker.allow():
+            return []
         try:
-            retriever = self._get_retriever("reviews")
-            docs = await retriever.ainvoke(query)
-            for doc in docs:
-                doc.metadata["source_type"] = "reviews"
-                doc.metadata["source_collection"] = "reviews"
-            return docs
+            retriever = self._get_retriever(collection)
+            if query_vector is None:
+                query_vector = await self._embed_query(query)
+            docs = await self._search_by_vector(retriever, query, query_vector)
         except Exception as e:
-            logger.warning(f"Failed to search reviews: {e}")
+            breaker.record_failure()
+            logger.warning("Failed to search %s: %s", collection, e)
             return []
+        breaker.record_success()
+        for doc in docs:
+            doc.metadata["source_type"] = collection
+            doc.metadata["source_collection"] = collection
+        return docs
 
-    async def _search_rules(self, query: str) -> List[Document]:
+    async def _search_reviews(
+        self, query: str, query_vector: Optional[List[float]] = None
+    ) -> List[Document]:
+        """检索 reviews 集合"""
+        return await self._search_tagged("reviews", query, query_vector)
+
+    async def _search_rules(
+        self, query: str, query_vector: Optional[List[float]] = None
+    ) -> List[Document]:
         """检索 rules 集合"""
-        try:
-            retriever = self._get_retriever("rules")
-            docs = await retriever.ainvoke(query)
-            for doc in docs:
-                doc.metadata["source_type"] = "rules"
-                doc.metadata["source_collection"] = "rules"
-            return docs
-        except Exception as e:
-            logger.warning(f"Failed to search rules: {e}")
-            return []
+        return await self._search_tagged("rules", query, query_vector)
 
     @staticmethod
     def _merge_with_source_tags(*doc_groups: List[Document]) -> List[Document]:
@@ -933,30 +1347,46 @@ class RAGService:
         return merged
 
     async def search_for_navigation(
-        self, query: str, filters: Optional[Dict[str, Any]] = None
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        query_vector: Optional[List[float]] = None,
     ) -> List[Document]:
         """导航决策：仅检索 world_facts + rules
 
         遵循 RAG 数据隔离规范：导航决策不使用 reviews。
+        调用方已有 _embed_query 生成的向量时可经 query_vector 传入，避免重复嵌入。
         """
-        wf_docs = await self._search_world_facts(query, filters)
-        rule_docs = await self._search_rules(query)
+        if query_vector is None:
+            query_vector = await self._embed_query(query)
+        wf_docs, rule_docs = await asyncio.gather(
+            self._search_world_facts(query, filters, query_vector),
+            self._search_rules(query, query_vector),
+        )
         return self._merge_with_source_tags(wf_docs, rule_docs)
 
-    async def search_for_evaluation(self, query: str) -> List[Document]:
+    async def search_for_evaluation(
+        self, query: str, query_vector: Optional[List[float]] = None
+    ) -> List[Document]:
         """主观评价：仅检索 reviews
 
         遵循 RAG 数据隔离规范：评价问题不使用 world_facts。
         """
-        return await self._search_reviews(query)
+        return await self._search_reviews(query, query_vector)
 
-    async def search_for_complex(self, query: str) -> List[Document]:
+    async def search_for_complex(
+        self, query: str, query_vector: Optional[List[float]] = None
+    ) -> List[Document]:
         """综合查询：多路检索，标注来源
 
         同时检索 world_facts 和 reviews，每条结果带 source_type 标注。
         """
-        wf_docs = await self._search_world_facts(query)
-        rv_docs = await self._search_reviews(query)
+        if query_vector is None:
+            query_vector = await self._embed_query(query)
+        wf_docs, rv_docs = await asyncio.gather(
+            self._search_world_facts(query, query_vector=query_vector),
+            self._search_reviews(query, query_vector),
+        )
         return self._merge_with_source_tags(wf_docs, rv_docs)
 
     async def health_check(self) -> Dict[str, Any]:
@@ -972,25 +1402,28 @@ class RAGService:
             "collections": {}
         }
         
-        try:
-            # 检查 Milvus 连接（同步方法）
-            health = self.milvus_client.health_check()
+        # Milvus 连接、集合检查与 Embedding 检查互不依赖，并发执行
+        # （"test" 的向量在首次检查后由 EmbeddingService 缓存，后续检查不再调用提供商）
+        health, collections, embedding = await asyncio.gather(
+            asyncio.to_thread(self.milvus_client.health_check),
+            asyncio.to_thread(self.milvus_client.list_collections),
+            self.embedding_service.embed_text("test"),
+            return_exceptions=True,
+        )
+        
+        if isinstance(health, BaseException):
+            logger.error("Health check failed: %s", health)
+        else:
             status["milvus"] = health.get("healthy", False)
-            
-            # 检查集合（同步方法）
+        
+        if isinstance(collections, BaseException):
+            logger.error("Health check failed: %s", collections)
+        else:
+            existing = set(collections)
             for collection in ["stores", "products", "locations", "reviews"]:
-                exists = self.milvus_client.has_collection(collection)
-                status["collections"][collection] = exists
-            
-            # 检查 Embedding 服务
-            try:
-                test_embedding = await self.embedding_service.embed_text("test")
-                status["embedding"] = len(test_embedding) > 0
-            except Exception:
-                status["embedding"] = False
-            
-        except Exception as e:
-            logger.error(f"Health check failed: {e}")
+                status["collections"][collection] = collection in existing
+        
+        status["embedding"] = not isinstance(embedding, BaseException) and len(embedding) > 0
         
         return status
 
@@ -1002,6 +1435,7 @@ class RAGService:
 # 全局 RAG 服务实例（懒加载）
 # 使用模块级变量实现单例模式，确保整个应用只有一个 RAGService 实例
 _rag_service: Optional[RAGService] = None
+_rag_service_lock = threading.Lock()
 
 
 def get_rag_service() -> RAGService:
@@ -1014,7 +1448,7 @@ def get_rag_service() -> RAGService:
     这是一个懒加载实现：
     - 首次调用时创建实例
     - 后续调用返回同一个实例
-    - 线程安全（Python GIL 保证）
+    - 线程安全（双重检查加锁：已创建后无锁快速返回，首次创建时加锁）
     
     Returns:
         RAGService: 全局唯一的 RAG 服务实例
@@ -1040,7 +1474,9 @@ def get_rag_service() -> RAGService:
     """
     global _rag_service
     if _rag_service is None:
-        _rag_service = RAGService()
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService()
     return _rag_service
 
 
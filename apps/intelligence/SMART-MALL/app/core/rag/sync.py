@@ -7,11 +7,19 @@
 - 同步日志
 """
 
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
+from pathlib import Path
 import logging
 import asyncio
+import itertools
+import os
+import time
+
+import numpy as np
+import xxhash
 
 from app.core.rag.milvus_client import MilvusClient, get_milvus_client
 from app.core.rag.embedding import EmbeddingService, get_embedding_service
@@ -38,6 +46,11 @@ class SyncResult:
     failed: int
     duration_ms: float
     timestamp: datetime
+    timestamp_iso: str = field(init=False)
+    
+    def __post_init__(self):
+        # 结果写入后不再变化，ISO 字符串只格式化一次
+        self.timestamp_iso = self.timestamp.isoformat()
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -47,10 +60,18 @@ class SyncResult:
             "updated": self.updated,
             "failed": self.failed,
             "duration_ms": self.duration_ms,
-            "timestamp": self.timestamp.isoformat()
+            "timestamp": self.timestamp_iso
         }
 
 
+class PartialSyncError(Exception):
+    """分块同步中途失败；inserted 为失败前已写入 Milvus 的条数"""
+
+    def __init__(self, inserted: int, error: Exception):
+        super().__init__(str(error))
+        self.inserted = inserted
+
+
 class DataSyncService:
     """
     数据同步服务
@@ -65,7 +86,7 @@ class DataSyncService:
     ):
         self._milvus_client = milvus_client
         self._embedding_service = embedding_service
-        self._sync_history: List[SyncResult] = []
+        self._sync_history: Deque[SyncResult] = deque(maxlen=max(settings.SYNC_HISTORY_MAX, 1))
     
     @property
     def milvus_client(self) -> MilvusClient:
@@ -79,58 +100,46 @@ class DataSyncService:
             self._embedding_service = get_embedding_service()
         return self._embedding_service
     
-    async def full_sync_stores(self, stores: List[StoreDocument]) -> SyncResult:
+    async def full_sync_stores(
+        self,
+        stores: Sequence[StoreDocument],
+        embeddings: Optional[List[List[float]]] = None
+    ) -> SyncResult:
         """
         全量同步店铺数据
         
         Args:
             stores: 店铺文档列表
+            embeddings: 预先计算好的向量（可选，与 stores 一一对应），提供时跳过 Embedding
             
         Returns:
             同步结果
         """
-        start_time = datetime.now()
+        start_time = time.monotonic()
         inserted = 0
         failed = 0
         
         try:
             # 确保集合存在
-            exists = await self.milvus_client.has_collection("stores")
+            exists = await self.milvus_client.has_collection_async("stores")
             if not exists:
-                await self.milvus_client.create_collection("stores", STORES_SCHEMA)
-            
-            # 生成 Embedding
-            texts = [self._build_store_text(s) for s in stores]
-            embeddings = await self.embedding_service.embed_batch(texts)
-            
-            # 准备数据
-            data = []
-            for store, embedding in zip(stores, embeddings):
-                data.append({
-                    "id": store.id,
-                    "name": store.name,
-                    "category": store.category,
-                    "description": store.description,
-                    "floor": store.floor,
-                    "area": store.area,
-                    "position_x": store.position_x,
-                    "position_y": store.position_y,
-                    "position_z": store.position_z,
-                    "tags": store.tags,
-                    "embedding": embedding
-                })
+                await self.milvus_client.create_collection_async("stores", STORES_SCHEMA)
             
-            # 插入数据
-            await self.milvus_client.insert("stores", data)
-            inserted = len(data)
+            # 分块生成 Embedding 并列式写入（未预先提供向量时逐块生成）
+            inserted = await self._embed_and_insert("stores", stores, StoreDocument, self._build_store_text, embeddings)
+            # 全量写入结束后 flush 一次，封存段以便建索引
+            await self.milvus_client.flush_collection_async("stores")
             
-            logger.info(f"Synced {inserted} stores to Milvus")
+            logger.info("Synced %s stores to Milvus", inserted)
             
         except Exception as e:
-            logger.error(f"Failed to sync stores: {e}")
-            failed = len(stores)
+            logger.error("Failed to sync stores: %s", e)
+            # 分块写入中途失败时，之前的块已写入 Milvus；flush 失败时数据已全部写入
+            if isinstance(e, PartialSyncError):
+                inserted = e.inserted
+            failed = len(stores) - inserted
         
-        duration = (datetime.now() - start_time).total_seconds() * 1000
+        duration = (time.monotonic() - start_time) * 1000
         
         result = SyncResult(
             collection="stores",
@@ -145,57 +154,46 @@ class DataSyncService:
         self._sync_history.append(result)
         return result
     
-    async def full_sync_products(self, products: List[ProductDocument]) -> SyncResult:
+    async def full_sync_products(
+        self,
+        products: Sequence[ProductDocument],
+        embeddings: Optional[List[List[float]]] = None
+    ) -> SyncResult:
         """
         全量同步商品数据
         
         Args:
             products: 商品文档列表
+            embeddings: 预先计算好的向量（可选，与 products 一一对应），提供时跳过 Embedding
             
         Returns:
             同步结果
         """
-        start_time = datetime.now()
+        start_time = time.monotonic()
         inserted = 0
         failed = 0
         
         try:
             # 确保集合存在
-            exists = await self.milvus_client.has_collection("products")
+            exists = await self.milvus_client.has_collection_async("products")
             if not exists:
-                await self.milvus_client.create_collection("products", PRODUCTS_SCHEMA)
+                await self.milvus_client.create_collection_async("products", PRODUCTS_SCHEMA)
             
-            # 生成 Embedding
-            texts = [self._build_product_text(p) for p in products]
-            embeddings = await self.embedding_service.embed_batch(texts)
+            # 分块生成 Embedding 并列式写入（未预先提供向量时逐块生成）
+            inserted = await self._embed_and_insert("products", products, ProductDocument, self._build_product_text, embeddings)
+            # 全量写入结束后 flush 一次，封存段以便建索引
+            await self.milvus_client.flush_collection_async("products")
             
-            # 准备数据
-            data = []
-            for product, embedding in zip(products, embeddings):
-                data.append({
-                    "id": product.id,
-                    "name": product.name,
-                    "brand": product.brand,
-                    "category": product.category,
-                    "description": product.description,
-                    "price": product.price,
-                    "store_id": product.store_id,
-                    "store_name": product.store_name,
-                    "tags": product.tags,
-                    "embedding": embedding
-                })
-            
-            # 插入数据
-            await self.milvus_client.insert("products", data)
-            inserted = len(data)
-            
-            logger.info(f"Synced {inserted} products to Milvus")
+            logger.info("Synced %s products to Milvus", inserted)
             
         except Exception as e:
-            logger.error(f"Failed to sync products: {e}")
-            failed = len(products)
+            logger.error("Failed to sync products: %s", e)
+            # 分块写入中途失败时，之前的块已写入 Milvus；flush 失败时数据已全部写入
+            if isinstance(e, PartialSyncError):
+                inserted = e.inserted
+            failed = len(products) - inserted
         
-        duration = (datetime.now() - start_time).total_seconds() * 1000
+        duration = (time.monotonic() - start_time) * 1000
         
         result = SyncResult(
             collection="products",
@@ -210,56 +208,46 @@ class DataSyncService:
         self._sync_history.append(result)
         return result
 
-    async def full_sync_locations(self, locations: List[LocationDocument]) -> SyncResult:
+    async def full_sync_locations(
+        self,
+        locations: Sequence[LocationDocument],
+        embeddings: Optional[List[List[float]]] = None
+    ) -> SyncResult:
         """
         全量同步位置数据
         
         Args:
             locations: 位置文档列表
+            embeddings: 预先计算好的向量（可选，与 locations 一一对应），提供时跳过 Embedding
             
         Returns:
             同步结果
         """
-        start_time = datetime.now()
+        start_time = time.monotonic()
         inserted = 0
         failed = 0
         
         try:
             # 确保集合存在
-            exists = await self.milvus_client.has_collection("locations")
+            exists = await self.milvus_client.has_collection_async("locations")
             if not exists:
-                await self.milvus_client.create_collection("locations", LOCATIONS_SCHEMA)
-            
-            # 生成 Embedding
-            texts = [self._build_location_text(loc) for loc in locations]
-            embeddings = await self.embedding_service.embed_batch(texts)
-            
-            # 准备数据
-            data = []
-            for location, embedding in zip(locations, embeddings):
-                data.append({
-                    "id": location.id,
-                    "name": location.name,
-                    "type": location.type,
-                    "description": location.description,
-                    "floor": location.floor,
-                    "position_x": location.position_x,
-                    "position_y": location.position_y,
-                    "position_z": location.position_z,
-                    "embedding": embedding
-                })
+                await self.milvus_client.create_collection_async("locations", LOCATIONS_SCHEMA)
             
-            # 插入数据
-            await self.milvus_client.insert("locations", data)
-            inserted = len(data)
+            # 分块生成 Embedding 并列式写入（未预先提供向量时逐块生成）
+            inserted = await self._embed_and_insert("locations", locations, LocationDocument, self._build_location_text, embeddings)
+            # 全量写入结束后 flush 一次，封存段以便建索引
+            await self.milvus_client.flush_collection_async("locations")
             
-            logger.info(f"Synced {inserted} locations to Milvus")
+            logger.info("Synced %s locations to Milvus", inserted)
             
         except Exception as e:
-            logger.error(f"Failed to sync locations: {e}")
-            failed = len(locations)
+            logger.error("Failed to sync locations: %s", e)
+            # 分块写入中途失败时，之前的块已写入 Milvus；flush 失败时数据已全部写入
+            if isinstance(e, PartialSyncError):
+                inserted = e.inserted
+            failed = len(locations) - inserted
         
-        duration = (datetime.now() - start_time).total_seconds() * 1000
+        duration = (time.monotonic() - start_time) * 1000
         
         result = SyncResult(
             collection="locations",
@@ -274,11 +262,116 @@ class DataSyncService:
         self._sync_history.append(result)
         return result
     
+    async def _embed_and_insert(
+        self,
+        collection_name: str,
+        docs: Sequence[Any],
+        doc_cls: Any,
+        build_text: Callable[[Any], str],
+        embeddings: Optional[Any] = None
+    ) -> int:
+        """
+        按 SYNC_CHUNK_SIZE 分块生成 Embedding 并列式写入
+        
+        未提供 embeddings 时，第 i 块写入 Milvus 的同时生成第 i+1 块的 Embedding，两类 I/O 重叠；
+        同一时刻只有一块在写入，内存中最多保留两块的向量。
+        提供 embeddings 时向量已全部在内存（或内存映射）中，只分块写入，不再有重叠。
+        
+        Args:
+            collection_name: 集合名称
+            docs: 文档列表
+            doc_cls: 文档类型（提供 to_columnar）
+            build_text: 文档 -> Embedding 文本
+            embeddings: 预先计算好的向量（与 docs 一一对应），提供时跳过 Embedding
+            
+        Returns:
+            写入的条数
+            
+        Raises:
+            PartialSyncError: 中途失败，携带失败前已写入的条数
+        """
+        size = settings.SYNC_CHUNK_SIZE
+        inserted = 0
+        pending: Optional[asyncio.Future] = None
+        try:
+            for start in range(0, len(docs), size):
+                chunk = docs[start:start + size]
+                if embeddings is None:
+                    vectors = await self.embedding_service.embed_batch([build_text(d) for d in chunk])
+                else:
+                    vectors = embeddings[start:start + size]
+                if len(vectors) != len(chunk):
+                    raise ValueError(f"Got {len(vectors)} embeddings for {len(chunk)} documents")
+                columns = doc_cls.to_columnar(chunk, vectors)
+                
+                if pending is not None:
+                    inserted += len(await pending)
+                    pending = None
+                pending = asyncio.ensure_future(
+                    self.milvus_client.insert_columns_async(collection_name, columns)
+                )
+            if pending is not None:
+                inserted += len(await pending)
+                pending = None
+        except Exception as e:
+            # 下一块 Embedding 失败时在途写入可能成功也可能失败：取回其结果计入条数，
+            # 失败则记录日志，不留下未被获取的任务异常
+            if pending is not None:
+                try:
+                    inserted += len(await pending)
+                except Exception as insert_error:
+                    if insert_error is not e:
+                        logger.error("Insert into '%s' failed during sync: %s", collection_name, insert_error)
+            raise PartialSyncError(inserted, e) from e
+        return inserted
+
+    @staticmethod
+    def _disk_cache_path(texts: List[str], provider: str) -> Optional[Path]:
+        """Embedding 磁盘缓存文件路径：文件名包含提供商模型、维度与全部文本的摘要，任一变化即失效"""
+        if not settings.SEED_EMBEDDING_CACHE_DIR:
+            return None
+        digest = xxhash.xxh3_128_hexdigest("\x1f".join(texts).encode("utf-8"))
+        model = provider.replace("/", "_").replace(":", "_")
+        name = f"{model}_{settings.EMBEDDING_DIMENSION}_{digest}.npy"
+        return Path(settings.SEED_EMBEDDING_CACHE_DIR) / name
+
+    async def _embed_with_disk_cache(self, texts: List[str]) -> Any:
+        """
+        批量生成 Embedding，结果按内容摘要缓存到磁盘
+
+        示例数据在开发、测试中反复导入，文本不变时直接内存映射读取上次的结果，
+        不再调用 Embedding 服务。读写缓存失败只记录日志，不影响同步。
+        只缓存主提供商生成的向量：查询向量由主提供商生成，回退提供商的向量写入后会一直被复用。
+        """
+        path = self._disk_cache_path(texts, self.embedding_service.primary_provider)
+        if path is not None and path.exists():
+            try:
+                vectors = np.load(path, mmap_mode="r")
+                if vectors.shape == (len(texts), settings.EMBEDDING_DIMENSION):
+                    logger.info("Loaded %s seed embeddings from %s", len(texts), path)
+                    return vectors
+            except Exception as e:
+                logger.warning("Failed to load seed embedding cache %s: %s", path, e)
+
+        embeddings, provider = await self.embedding_service.embed_batch_with_provider(texts)
+
+        if path is not None and provider == self.embedding_service.primary_provider:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(path.name + ".tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, np.asarray(embeddings, dtype=np.float32))
+                os.replace(tmp, path)  # 原子替换，避免并发导入读到半个文件
+            except Exception as e:
+                logger.warning("Failed to write seed embedding cache %s: %s", path, e)
+        return embeddings
+
     async def full_sync_all(
         self,
-        stores: List[StoreDocument],
-        products: List[ProductDocument],
-        locations: List[LocationDocument]
+        stores: Sequence[StoreDocument],
+        products: Sequence[ProductDocument],
+        locations: Sequence[LocationDocument],
+        cache_embeddings: bool = False
     ) -> List[SyncResult]:
         """
         全量同步所有数据
@@ -287,25 +380,50 @@ class DataSyncService:
             stores: 店铺列表
             products: 商品列表
             locations: 位置列表
+            cache_embeddings: 是否使用 Embedding 磁盘缓存（用于反复导入的示例数据）
             
         Returns:
-            同步结果列表
+            同步结果列表。各集合并发同步、各自捕获异常，一个集合失败不影响其他集合；
+            失败集合的 inserted 为失败前已写入的条数，failed = len(docs) - inserted
         """
-        results = []
+        # 总量不超过一块时，三个集合的文本合并为一次批量 Embedding 再按集合切分（少两次调用）；
+        # 磁盘缓存以全部文本的摘要为键，同样需要一次性生成。
+        # 其余情况交给各集合的分块流水线：Embedding 与写入重叠，内存中只保留两块向量
+        n_total = len(stores) + len(products) + len(locations)
+        combine = n_total > 0 and (cache_embeddings or n_total <= settings.SYNC_CHUNK_SIZE)
+        store_vecs = product_vecs = location_vecs = None
+        if combine:
+            texts = (
+                [self._build_store_text(s) for s in stores]
+                + [self._build_product_text(p) for p in products]
+                + [self._build_location_text(loc) for loc in locations]
+            )
+            try:
+                if cache_embeddings:
+                    embeddings = await self._embed_with_disk_cache(texts)
+                else:
+                    embeddings = await self.embedding_service.embed_batch(texts)
+                # embed_batch 会跳过空文本，数量不符时按位置切分会把向量错配到其他文档或集合
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Got {len(embeddings)} embeddings for {len(texts)} texts")
+                n_stores, n_products = len(stores), len(products)
+                store_vecs = embeddings[:n_stores]
+                product_vecs = embeddings[n_stores:n_stores + n_products]
+                location_vecs = embeddings[n_stores + n_products:]
+            except Exception as e:
+                # 失败时退回各集合单独生成 Embedding，由各自的 SyncResult 记录失败
+                logger.warning("Combined embedding for full sync failed: %s", e)
         
+        # 三个集合互不依赖，并发写入 Milvus
+        tasks = []
         if stores:
-            result = await self.full_sync_stores(stores)
-            results.append(result)
-        
+            tasks.append(self.full_sync_stores(stores, store_vecs))
         if products:
-            result = await self.full_sync_products(products)
-            results.append(result)
-        
+            tasks.append(self.full_sync_products(products, product_vecs))
         if locations:
-            result = await self.full_sync_locations(locations)
-            results.append(result)
+            tasks.append(self.full_sync_locations(locations, location_vecs))
         
-        return results
+        return list(await asyncio.gather(*tasks))
     
     async def incremental_sync_stores(
         self,
@@ -322,7 +440,7 @@ class DataSyncService:
         Returns:
             同步结果
         """
-        start_time = datetime.now()
+        start_time = time.monotonic()
         updated = 0
         failed = 0
         
@@ -330,43 +448,24 @@ class DataSyncService:
             if operation == "delete":
                 # 删除操作
                 ids = [s.id for s in stores]
-                await self.milvus_client.delete("stores", ids)
+                await self.milvus_client.delete_async("stores", ids)
                 updated = len(ids)
             else:
-                # Upsert 操作：先删除再插入
-                ids = [s.id for s in stores]
-                await self.milvus_client.delete("stores", ids)
-                
-                # 生成 Embedding 并插入
+                # Upsert 操作：生成 Embedding 后按主键原生覆盖写入
                 texts = [self._build_store_text(s) for s in stores]
                 embeddings = await self.embedding_service.embed_batch(texts)
                 
-                data = []
-                for store, embedding in zip(stores, embeddings):
-                    data.append({
-                        "id": store.id,
-                        "name": store.name,
-                        "category": store.category,
-                        "description": store.description,
-                        "floor": store.floor,
-                        "area": store.area,
-                        "position_x": store.position_x,
-                        "position_y": store.position_y,
-                        "position_z": store.position_z,
-                        "tags": store.tags,
-                        "embedding": embedding
-                    })
-                
-                await self.milvus_client.insert("stores", data)
-                updated = len(data)
+                columns = StoreDocument.to_columnar(stores, embeddings)
+                await self.milvus_client.upsert_columns_async("stores", columns)
+                updated = len(stores)
             
-            logger.info(f"Incremental sync: {operation} {updated} stores")
+            logger.info("Incremental sync: %s %s stores", operation, updated)
             
         except Exception as e:
-            logger.error(f"Failed to incremental sync stores: {e}")
+            logger.error("Failed to incremental sync stores: %s", e)
             failed = len(stores)
         
-        duration = (datetime.now() - start_time).total_seconds() * 1000
+        duration = (time.monotonic() - start_time) * 1000
         
         result = SyncResult(
             collection="stores",
@@ -381,42 +480,38 @@ class DataSyncService:
         self._sync_history.append(result)
         return result
     
+    @staticmethod
+    def _join_parts(*parts: str) -> str:
+        """拼接非空文本片段（单次 join，无中间列表）"""
+        return " ".join(filter(None, parts))
+
     def _build_store_text(self, store: StoreDocument) -> str:
         """构建店铺文本用于 Embedding"""
-        parts = [store.name]
-        if store.category:
-            parts.append(store.category)
-        if store.description:
-            parts.append(store.description)
-        if store.tags:
-            parts.append(" ".join(store.tags))
-        return " ".join(parts)
+        return self._join_parts(
+            store.name,
+            store.category,
+            store.description,
+            " ".join(store.tags) if store.tags else "",
+        )
     
     def _build_product_text(self, product: ProductDocument) -> str:
         """构建商品文本用于 Embedding"""
-        parts = [product.name]
-        if product.brand:
-            parts.append(product.brand)
-        if product.category:
-            parts.append(product.category)
-        if product.description:
-            parts.append(product.description)
-        if product.tags:
-            parts.append(" ".join(product.tags))
-        return " ".join(parts)
+        return self._join_parts(
+            product.name,
+            product.brand,
+            product.category,
+            product.description,
+            " ".join(product.tags) if product.tags else "",
+        )
     
     def _build_location_text(self, location: LocationDocument) -> str:
         """构建位置文本用于 Embedding"""
-        parts = [location.name]
-        if location.type:
-            parts.append(location.type)
-        if location.description:
-            parts.append(location.description)
-        return " ".join(parts)
+        return self._join_parts(location.name, location.type, location.description)
     
     def get_sync_history(self, limit: int = 10) -> List[SyncResult]:
-        """获取同步历史"""
-        return self._sync_history[-limit:]
+        """获取同步历史（最近 limit 条，按时间正序）"""
+        skip = max(len(self._sync_history) - limit, 0)
+        return list(itertools.islice(self._sync_history, skip, None))
     
     def clear_sync_history(self):
         """清空同步历史"""
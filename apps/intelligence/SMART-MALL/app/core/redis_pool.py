@@ -19,6 +19,7 @@ class RedisPoolFactory:
     """统一 Redis 连接池工厂（单例）"""
 
     _pool: Optional[aioredis.ConnectionPool] = None
+    _binary_pool: Optional[aioredis.ConnectionPool] = None
 
     @classmethod
     async def get_pool(cls) -> aioredis.ConnectionPool:
@@ -43,6 +44,24 @@ class RedisPoolFactory:
         pool = await cls.get_pool()
         return aioredis.Redis(connection_pool=pool)
 
+    @classmethod
+    async def get_binary_client(cls) -> aioredis.Redis:
+        """获取不解码响应的 Redis 客户端（用于存取 bytes，如向量缓存）
+
+        该客户端服务于请求路径上的缓存读写，设置较短的建连与读写超时，
+        Redis 不可用时快速失败而不是阻塞请求。
+        """
+        if cls._binary_pool is None:
+            settings = get_settings()
+            cls._binary_pool = aioredis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                decode_responses=False,
+                socket_connect_timeout=settings.REDIS_BINARY_CONNECT_TIMEOUT,
+                socket_timeout=settings.REDIS_BINARY_SOCKET_TIMEOUT,
+            )
+        return aioredis.Redis(connection_pool=cls._binary_pool)
+
     @classmethod
     async def close(cls) -> None:
         """关闭连接池，释放资源"""
@@ -50,3 +69,6 @@ class RedisPoolFactory:
             await cls._pool.disconnect()
             cls._pool = None
             logger.info("Redis connection pool closed")
+        if cls._binary_pool is not None:
+            await cls._binary_pool.disconnect()
+            cls._binary_pool = None
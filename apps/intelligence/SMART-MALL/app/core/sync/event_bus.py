@@ -32,10 +32,10 @@ class EventBus:
             await client.xgroup_create(
                 self.STREAM_KEY, self.GROUP_NAME, id="0", mkstream=True
             )
-            logger.info(f"Consumer group '{self.GROUP_NAME}' created")
+            logger.info("Consumer group '%s' created", self.GROUP_NAME)
         except Exception as e:
             if "BUSYGROUP" in str(e):
-                logger.debug(f"Consumer group '{self.GROUP_NAME}' already exists")
+                logger.debug("Consumer group '%s' already exists", self.GROUP_NAME)
             else:
                 raise
 
@@ -53,7 +53,7 @@ class EventBus:
             self.STREAM_KEY,
             {"data": event.model_dump_json()},
         )
-        logger.debug(f"Published event {event.event_id} as {msg_id}")
+        logger.debug("Published event %s as %s", event.event_id, msg_id)
         return msg_id
 
     async def consume(
@@ -98,4 +98,4 @@ class EventBus:
         """
         client = await RedisPoolFactory.get_client()
         await client.xack(self.STREAM_KEY, self.GROUP_NAME, message_id)
-        logger.debug(f"Acknowledged message {message_id}")
+        logger.debug("Acknowledged message %s", message_id)
@@ -172,7 +172,7 @@ class RetryQueue:
             await client.zadd(self.RETRY_KEY, {entry: execute_at})
             recovered += 1
 
-        logger.info(f"Recovered {recovered} retry events from database")
+        logger.info("Recovered %s retry events from database", recovered)
         return recovered
 
     # --- 外部依赖接口（由子类或集成测试覆盖） ---
@@ -11,10 +11,13 @@ import asyncio
 import json
 import logging
 import time
-from typing import Optional
+from typing import Optional, Set
 
 from app.core.embedding_provider import get_embeddings, EmbeddingProvider
-from app.core.rag.milvus_client import get_milvus_client
+from app.core.rag.milvus_client import VECTOR_NP_DTYPE, build_id_in_expr, get_milvus_client
+from app.core.rag.schemas import l2_normalize
+from app.core.rag.orchestrator import RAGOrchestrator
+from app.core.rag.service import get_rag_service
 from app.core.redis_pool import RedisPoolFactory
 from app.core.sync.event_bus import EventBus
 from app.core.sync.events import SyncEvent
@@ -22,6 +25,81 @@ from app.core.sync.events import SyncEvent
 logger = logging.getLogger(__name__)
 
 
+def _tags_json(metadata: dict) -> str:
+    tags = metadata.get("tags", "[]")
+    return tags if isinstance(tags, str) else json.dumps(tags, ensure_ascii=False)
+
+
+def _product_fields(metadata: dict) -> dict:
+    return {
+        "name": str(metadata.get("name", "")),
+        "description": str(metadata.get("description", "")),
+        "category": str(metadata.get("category", "")),
+        "brand": str(metadata.get("brand", "")),
+        "price": float(metadata.get("price", 0.0) or 0.0),
+        "store_id": str(metadata.get("store_id", "")),
+        "store_name": str(metadata.get("store_name", "")),
+        "image_url": str(metadata.get("image_url", "")),
+        "rating": float(metadata.get("rating", 0.0) or 0.0),
+        "stock": int(metadata.get("stock", 0) or 0),
+        "tags": _tags_json(metadata),
+    }
+
+
+def _store_fields(metadata: dict) -> dict:
+    return {
+        "name": str(metadata.get("name", "")),
+        "description": str(metadata.get("description", "")),
+        "category": str(metadata.get("category", "")),
+        "floor": int(metadata.get("floor", 1) or 1),
+        "area": str(metadata.get("area", "")),
+        "position_x": float(metadata.get("position_x", 0.0) or 0.0),
+        "position_y": float(metadata.get("position_y", 0.0) or 0.0),
+        "position_z": float(metadata.get("position_z", 0.0) or 0.0),
+        "business_hours": str(metadata.get("business_hours", "09:00-22:00")),
+        "rating": float(metadata.get("rating", 0.0) or 0.0),
+        "tags": _tags_json(metadata),
+    }
+
+
+def _location_fields(metadata: dict) -> dict:
+    return {
+        "name": str(metadata.get("name", "")),
+        "type": str(metadata.get("type", "area")),
+        "floor": int(metadata.get("floor", 1) or 1),
+        "position_x": float(metadata.get("position_x", 0.0) or 0.0),
+        "position_y": float(metadata.get("position_y", 0.0) or 0.0),
+        "position_z": float(metadata.get("position_z", 0.0) or 0.0),
+        "description": str(metadata.get("description", "")),
+    }
+
+
+def _review_fields(metadata: dict) -> dict:
+    return {
+        "product_id": str(metadata.get("product_id", "")),
+        "product_name": str(metadata.get("product_name", "")),
+        "store_id": str(metadata.get("store_id", "")),
+        "store_name": str(metadata.get("store_name", "")),
+        "rating": float(metadata.get("rating", 0.0) or 0.0),
+        "content": str(metadata.get("content", "")),
+        "reply_content": str(metadata.get("reply_content", "")),
+    }
+
+
+def _rule_fields(metadata: dict) -> dict:
+    return {"content": str(metadata.get("content", ""))}
+
+
+# Milvus 集合 → 标量字段构建函数（id / embedding / updated_at 由调用方统一填充）
+_ENTITY_BUILDERS = {
+    "products": _product_fields,
+    "stores": _store_fields,
+    "locations": _location_fields,
+    "reviews": _review_fields,
+    "rules": _rule_fields,
+}
+
+
 class SyncService:
     """增量同步服务
 
@@ -44,6 +122,8 @@ class SyncService:
         self.event_bus = event_bus or EventBus()
         self.retry_queue = retry_queue
         self._shutdown = asyncio.Event()
+        # 本批次写过的集合：逐条写入不 flush，批次处理完后每个集合 flush 一次
+        self._dirty_collections: Set[str] = set()
 
     async def process_event(self, event: SyncEvent, message_id: str = None) -> None:
         """处理单个同步事件。
@@ -54,7 +134,7 @@ class SyncService:
         """
         # 1. 幂等性检查
         if await self._is_event_processed(event.event_id):
-            logger.debug(f"Event {event.event_id} already processed, skipping")
+            logger.debug("Event %s already processed, skipping", event.event_id)
             if message_id:
                 await self.event_bus.acknowledge(message_id)
             return
@@ -142,17 +222,45 @@ class SyncService:
                                 "reason": str(enqueue_err),
                                 "action": "message_stays_in_pel",
                             }, ensure_ascii=False))
+                await self._flush_dirty_collections()
             except asyncio.CancelledError:
                 logger.info("Consumer task cancelled, shutting down gracefully")
                 break
             except Exception as e:
-                logger.error(f"Consumer loop error: {e}")
+                logger.error("Consumer loop error: %s", e)
                 await asyncio.sleep(1)
 
     async def shutdown(self) -> None:
         """优雅退出"""
         self._shutdown.set()
 
+    async def _flush_dirty_collections(self) -> None:
+        """flush 本批次写过的集合。
+
+        upsert/delete 返回时数据已写入 Milvus 日志并可检索，flush 只负责封存段；
+        逐条 flush 会产生大量小段并拖慢高频小批量同步，因此按批次合并。
+        flush 失败不影响数据正确性，仅记录日志。
+        """
+        if not self._dirty_collections:
+            return
+        collections, self._dirty_collections = self._dirty_collections, set()
+        if "stores" in collections:
+            # 店铺变更后导航/过滤索引立即失效，不等 TTL 过期（同时清空语义缓存）
+            get_rag_service().invalidate_store_index()
+        else:
+            # 其他集合变更同样会使语义缓存中的检索证据过期
+            RAGOrchestrator.clear_semantic_caches()
+        client = get_milvus_client()
+        for collection in collections:
+            try:
+                await asyncio.to_thread(client.flush_collection, collection)
+            except Exception as e:
+                logger.warning(json.dumps({
+                    "event": "milvus_flush_failed",
+                    "collection": collection,
+                    "reason": str(e),
+                }, ensure_ascii=False))
+
     async def _is_event_processed(self, event_id: str) -> bool:
         """幂等性检查：Redis 缓存（快速路径）→ 数据库（持久化保障）→ 回填缓存。"""
         # 快速路径：Redis 缓存
@@ -293,6 +401,13 @@ class SyncService:
         self, collection: str, entity_id: str, vector: list, metadata: dict
     ) -> None:
         """Upsert 到 Milvus（create 和 update 均使用 upsert）。"""
+        entity = self._build_entity_for_collection(collection, entity_id, vector, metadata)
+        # Milvus 调用均为阻塞 RPC，放到线程中执行，避免阻塞事件循环
+        await asyncio.to_thread(self._milvus_upsert_blocking, collection, entity_id, entity)
+        self._dirty_collections.add(collection)
+
+    @staticmethod
+    def _milvus_upsert_blocking(collection: str, entity_id: str, entity: dict) -> None:
         client = get_milvus_client()
         if not client.is_connected():
             client.connect()
@@ -301,21 +416,17 @@ class SyncService:
         if col is None:
             raise RuntimeError(f"Milvus collection not found: {collection}")
 
-        entity = self._build_entity_for_collection(collection, entity_id, vector, metadata)
-
-        try:
-            col.delete(expr=f"id in ['{entity_id}']")
-        except Exception:
-            # 允许旧数据不存在
-            pass
-
+        # 原生 upsert：按主键覆盖，旧数据不存在时等同插入
         field_names = [field.name for field in col.schema.fields]
-        insert_data = [[entity[field]] for field in field_names]
-        col.insert(insert_data)
-        col.flush()
+        col.upsert([[entity[field]] for field in field_names])
 
     async def _milvus_delete(self, collection: str, entity_id: str) -> None:
         """从 Milvus 删除记录。"""
+        await asyncio.to_thread(self._milvus_delete_blocking, collection, entity_id)
+        self._dirty_collections.add(collection)
+
+    @staticmethod
+    def _milvus_delete_blocking(collection: str, entity_id: str) -> None:
         client = get_milvus_client()
         if not client.is_connected():
             client.connect()
@@ -323,84 +434,18 @@ class SyncService:
         col = client.get_collection(collection)
         if col is None:
             return
-        col.delete(expr=f"id in ['{entity_id}']")
-        col.flush()
+        col.delete(expr=build_id_in_expr([entity_id]))
 
     def _build_entity_for_collection(
         self, collection: str, entity_id: str, vector: list, metadata: dict
     ) -> dict:
+        builder = _ENTITY_BUILDERS.get(collection)
+        if builder is None:
+            raise RuntimeError(f"Unsupported collection: {collection}")
         now = int(time.time())
-
-        if collection == "products":
-            return {
-                "id": entity_id,
-                "name": str(metadata.get("name", "")),
-                "description": str(metadata.get("description", "")),
-                "category": str(metadata.get("category", "")),
-                "brand": str(metadata.get("brand", "")),
-                "price": float(metadata.get("price", 0.0) or 0.0),
-                "store_id": str(metadata.get("store_id", "")),
-                "store_name": str(metadata.get("store_name", "")),
-                "image_url": str(metadata.get("image_url", "")),
-                "rating": float(metadata.get("rating", 0.0) or 0.0),
-                "stock": int(metadata.get("stock", 0) or 0),
-                "tags": metadata.get("tags", "[]") if isinstance(metadata.get("tags", "[]"), str) else json.dumps(metadata.get("tags", []), ensure_ascii=False),
-                "embedding": vector,
-                "updated_at": int(metadata.get("updated_at", now) or now),
-            }
-
-        if collection == "stores":
-            return {
-                "id": entity_id,
-                "name": str(metadata.get("name", "")),
-                "description": str(metadata.get("description", "")),
-                "category": str(metadata.get("category", "")),
-                "floor": int(metadata.get("floor", 1) or 1),
-                "area": str(metadata.get("area", "")),
-                "position_x": float(metadata.get("position_x", 0.0) or 0.0),
-                "position_y": float(metadata.get("position_y", 0.0) or 0.0),
-                "position_z": float(metadata.get("position_z", 0.0) or 0.0),
-                "business_hours": str(metadata.get("business_hours", "09:00-22:00")),
-                "rating": float(metadata.get("rating", 0.0) or 0.0),
-                "tags": metadata.get("tags", "[]") if isinstance(metadata.get("tags", "[]"), str) else json.dumps(metadata.get("tags", []), ensure_ascii=False),
-                "embedding": vector,
-                "updated_at": int(metadata.get("updated_at", now) or now),
-            }
-
-        if collection == "locations":
-            return {
-                "id": entity_id,
-                "name": str(metadata.get("name", "")),
-                "type": str(metadata.get("type", "area")),
-                "floor": int(metadata.get("floor", 1) or 1),
-                "position_x": float(metadata.get("position_x", 0.0) or 0.0),
-                "position_y": float(metadata.get("position_y", 0.0) or 0.0),
-                "position_z": float(metadata.get("position_z", 0.0) or 0.0),
-                "description": str(metadata.get("description", "")),
-                "embedding": vector,
-                "updated_at": int(metadata.get("updated_at", now) or now),
-            }
-
-        if collection == "reviews":
-            return {
-                "id": entity_id,
-                "product_id": str(metadata.get("product_id", "")),
-                "product_name": str(metadata.get("product_name", "")),
-                "store_id": str(metadata.get("store_id", "")),
-                "store_name": str(metadata.get("store_name", "")),
-                "rating": float(metadata.get("rating", 0.0) or 0.0),
-                "content": str(metadata.get("content", "")),
-                "reply_content": str(metadata.get("reply_content", "")),
-                "embedding": vector,
-                "updated_at": int(metadata.get("updated_at", now) or now),
-            }
-
-        if collection == "rules":
-            return {
-                "id": entity_id,
-                "content": str(metadata.get("content", "")),
-                "embedding": vector,
-                "updated_at": int(metadata.get("updated_at", now) or now),
-            }
-
-        raise RuntimeError(f"Unsupported collection: {collection}")
+        entity = builder(metadata)
+        entity["id"] = entity_id
+        # 与全量同步一致：归一化后按 Schema 的向量类型写入（FLOAT16_VECTOR 需 float16 数组）
+        entity["embedding"] = l2_normalize(vector).astype(VECTOR_NP_DTYPE, copy=False)
+        entity["updated_at"] = int(metadata.get("updated_at", now) or now)
+        return entity
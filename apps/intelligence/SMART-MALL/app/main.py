@@ -16,6 +16,7 @@ Smart Mall Intelligence Service - FastAPI 入口
 """
 
 from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
@@ -36,6 +37,8 @@ from app.api.sync import router as sync_router, metrics_router
 from app.api.voice_ws import router as voice_ws_router
 from app.core.config import settings
 from app.core.redis_pool import RedisPoolFactory
+from app.core.embedding_provider import aclose_http_clients
+from app.core.rag.embedding import aclose_embedding_service
 from app.core.sync.event_bus import EventBus
 from app.core.sync.sync_service import SyncService
 from app.core.rag.service import init_rag_service
@@ -138,6 +141,20 @@ async def lifespan(app: FastAPI):
             pass
         logger.info("Sync consumer stopped")
 
+    # 等待进行中的批量 Embedding 完成（需在关闭 HTTP 连接池之前）
+    try:
+        await aclose_embedding_service()
+        logger.info("Embedding batches drained")
+    except Exception as e:
+        logger.warning("Embedding service close failed: %s", e)
+
+    # 关闭 Embedding 共享 HTTP 连接池
+    try:
+        await aclose_http_clients()
+        logger.info("Embedding HTTP clients closed")
+    except Exception as e:
+        logger.warning("Embedding HTTP clients close failed: %s", e)
+
     # 关闭 Redis 连接池（同时释放 EventBus 依赖的连接）
     try:
         await RedisPoolFactory.close()
@@ -150,7 +167,9 @@ app = FastAPI(
     title="Smart Mall Intelligence Service",
     description="智能商城导购系统 - 智能服务",
     version=settings.CONFIG_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    # 响应统一用 orjson 序列化（检索结果列表较大时明显快于标准库 json）
+    default_response_class=ORJSONResponse
 )
 
 # CORS 配置
@@ -167,19 +186,19 @@ app.add_middleware(
 async def add_request_id(request: Request, call_next):
     """添加请求追踪 ID"""
     request_id = request.headers.get("X-Request-ID", f"req_{secrets.token_hex(6)}")
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     try:
         response = await call_next(request)
     except Exception:
-        process_time = time.time() - start_time
+        process_time = time.perf_counter() - start_time
         logger.error(
             "[%s] %s %s - unhandled exception - %.3fs",
             request_id, request.method, request.url.path, process_time,
         )
         raise
 
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     response.headers["X-Request-ID"] = request_id
     response.headers["X-Process-Time"] = str(process_time)
 
@@ -51,16 +51,17 @@ class Transform2D(BaseModel):
 
 
 def calculate_polygon_area(vertices: List[Point2D]) -> float:
-    """计算多边形面积"""
+    """计算多边形面积（鞋带公式）"""
     if len(vertices) < 3:
         return 0
     
-    area = 0
-    n = len(vertices)
-    for i in range(n):
-        j = (i + 1) % n
-        area += vertices[i].x * vertices[j].y
-        area -= vertices[j].x * vertices[i].y
+    # 先取出坐标，循环内不再访问模型属性；与错位一位的序列配对，省去取模
+    xs = [v.x for v in vertices]
+    ys = [v.y for v in vertices]
+    area = sum(
+        x0 * y1 - x1 * y0
+        for x0, y0, x1, y1 in zip(xs, ys, xs[1:] + xs[:1], ys[1:] + ys[:1])
+    )
     
     return abs(area / 2)
 
@@ -70,15 +71,8 @@ def calculate_polygon_perimeter(vertices: List[Point2D]) -> float:
     if len(vertices) < 2:
         return 0
     
-    perimeter = 0
-    n = len(vertices)
-    for i in range(n):
-        j = (i + 1) % n
-        dx = vertices[j].x - vertices[i].x
-        dy = vertices[j].y - vertices[i].y
-        perimeter += math.sqrt(dx * dx + dy * dy)
-    
-    return perimeter
+    points = [(v.x, v.y) for v in vertices]
+    return sum(math.dist(p, q) for p, q in zip(points, points[1:] + points[:1]))
 
 
 def calculate_polygon_center(vertices: List[Point2D]) -> Point2D: